@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------------------------
+# Copyright (c) 2011-2017, Ryan Galloway (ryan@rsgalloway.com)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  - Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#  - Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#  - Neither the name of the software nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# -----------------------------------------------------------------------------
+
+"""Times pyseq.uncompress on sequence strings of several formats and
+lengths, e.g. ::
+
+    $ python benchmarks/bench_uncompress.py 10 100 1000
+
+Each argument is the number of frames of the sequences, and the cost is
+reported per sequence string.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pyseq
+
+
+FORMATS = [
+    '%h%p%t %R',
+    '%h%p%t %r',
+    '%h%p%t %r (%m)',
+    '%h%p%t %f',
+]
+
+
+def make_strings(fmt, frames, count=100):
+    """Returns `count` sequence strings of `frames` frames with a gap,
+    formatted with fmt.
+    """
+    strings = []
+    for shot in range(count):
+        names = ['/shows/abc/%03d/render.%04d.exr' % (shot, f)
+                 for f in range(1001, 1001 + frames + 1) if f != 1003]
+        strings.append(pyseq.Sequence(names).format(fmt))
+    return strings
+
+
+def bench(fmt, frames, repeat=5):
+    """Returns the seconds per uncompress call.
+    """
+    strings = make_strings(fmt, frames)
+    start = time.time()
+    for i in range(repeat):
+        for s in strings:
+            pyseq.uncompress(s, fmt=fmt)
+    return (time.time() - start) / (repeat * len(strings))
+
+
+def main(args):
+    counts = [int(a) for a in args] or [10, 100, 1000]
+    print('%-16s %8s %14s' % ('format', 'frames', 'usec/string'))
+    for fmt in FORMATS:
+        for count in counts:
+            print('%-16s %8d %14.1f' % (fmt, count, bench(fmt, count) * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
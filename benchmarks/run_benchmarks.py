@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------------------------
+# Copyright (c) 2011-2017, Ryan Galloway (ryan@rsgalloway.com)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  - Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#  - Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#  - Neither the name of the software nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# -----------------------------------------------------------------------------
+
+"""Runs the benchmark suite on synthetic render trees of several sizes and
+writes the results as JSON, e.g. ::
+
+    $ python benchmarks/run_benchmarks.py -s 1000,10000,100000
+    $ python benchmarks/run_benchmarks.py -s 1000000 -o new.json -c old.json
+
+For each size a tree is generated with synth.make_tree() in a temporary
+directory, then get_sequences, iget_sequences, walk, Sequence.format,
+uncompress and the lss script are timed on it, keeping the best of a few
+runs. lss is a Python 2 script, run with --lss-python (python2 by default)
+and skipped if that is not a Python 2 interpreter. Results are written to results-<pyseq version>-py<version>.json
+unless -o is given, and -c prints the speedup against an earlier file.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import optparse
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import pyseq
+import synth
+
+UNCOMPRESS_FORMAT = '%h%p%t %R'
+
+
+def best_time(func, setup=None, repeat=3):
+    """Returns the best time of `repeat` calls of func(setup()), only the
+    call to func being timed.
+    """
+    best = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.time()
+        func(arg)
+        seconds = time.time() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best
+
+
+def is_python2(python):
+    """Returns True if python runs a Python 2 interpreter.
+    """
+    with open(os.devnull, 'w') as devnull:
+        try:
+            return subprocess.call(
+                [python, '-c',
+                 'import sys; sys.exit(sys.version_info[0] != 2)'],
+                stdout=devnull, stderr=subprocess.STDOUT) == 0
+        except OSError:
+            return False
+
+
+def run_lss(root, python):
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(
+            [python, os.path.join(ROOT, 'lss'), '-r', root],
+            stdout=devnull, stderr=subprocess.STDOUT)
+
+
+def benchmarks(root, names, lss_python=None):
+    """Returns the list of (name, func, setup) benchmarks of a tree, lss
+    only if lss_python is given.
+    """
+    paths = [os.path.join(root, name) for name in names]
+    files = [os.path.basename(name) for name in names]
+
+    def seqs():
+        return pyseq.get_sequences(paths)
+
+    def strings():
+        return [s.format(UNCOMPRESS_FORMAT) for s in pyseq.get_sequences(files)
+                if len(s) > 1]
+
+    tests = [
+        ('get_sequences', lambda _: pyseq.get_sequences(paths), None),
+        ('iget_sequences', lambda _: list(pyseq.iget_sequences(paths)), None),
+        ('walk', lambda _: list(pyseq.walk(root, cache=False)), None),
+        ('walk_jobs8',
+         lambda _: list(pyseq.walk(root, jobs=8, cache=False)), None),
+        ('format', lambda s: [x.format(pyseq.global_format) for x in s],
+         seqs),
+        ('uncompress',
+         lambda s: [pyseq.uncompress(x, UNCOMPRESS_FORMAT) for x in s],
+         strings),
+    ]
+    if lss_python:
+        tests.append(('lss', lambda _: run_lss(root, lss_python), None))
+    return tests
+
+
+def run(sizes, repeat=3, only=None, lss_python='python2'):
+    """Runs the benchmarks on a tree of each size.
+
+    :return: list of result dicts.
+    """
+    if (not only or 'lss' in only) and not is_python2(lss_python):
+        print('skipping lss: %s is not a Python 2 interpreter, see '
+              '--lss-python' % lss_python)
+        lss_python = None
+    results = []
+    for size in sizes:
+        root = tempfile.mkdtemp(prefix='pyseq-bench-')
+        try:
+            names = synth.make_names(size)
+            synth.make_tree(root, size)
+            for name, func, setup in benchmarks(root, names, lss_python):
+                if only and name not in only:
+                    continue
+                result = {'benchmark': name, 'files': size}
+                try:
+                    seconds = best_time(func, setup, repeat)
+                except Exception as err:
+                    result['error'] = str(err)
+                    print('%-16s %10d %10s  %s' % (name, size, '-', err))
+                else:
+                    result['seconds'] = seconds
+                    result['files_per_second'] = size / max(seconds, 1e-9)
+                    print('%-16s %10d %10.4f %14d' % (
+                        name, size, seconds, result['files_per_second']))
+                results.append(result)
+        finally:
+            shutil.rmtree(root)
+    return results
+
+
+def compare(results, baseline):
+    """Prints the speedup of each result over the same benchmark and size
+    in baseline, > 1 being faster.
+    """
+    old = dict(((r['benchmark'], r['files']), r.get('seconds'))
+               for r in baseline['results'])
+    print('\ncompared to pyseq %s, python %s' % (
+        baseline['pyseq'], baseline['python']))
+    for result in results:
+        before = old.get((result['benchmark'], result['files']))
+        after = result.get('seconds')
+        if before and after:
+            print('%-16s %10d %9.2fx' % (
+                result['benchmark'], result['files'], before / after))
+
+
+def main(args):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-s', '--sizes', default='1000,10000,100000',
+                      help='comma separated numbers of files '
+                           '[default: %default]')
+    parser.add_option('-r', '--repeat', type='int', default=3,
+                      help='runs of each benchmark [default: %default]')
+    parser.add_option('-b', '--benchmarks',
+                      help='comma separated benchmarks to run')
+    parser.add_option('-o', '--output', help='JSON results file')
+    parser.add_option('-c', '--compare', help='JSON results to compare to')
+    parser.add_option('--lss-python', default='python2',
+                      help='Python 2 interpreter to run lss with '
+                           '[default: %default]')
+    options, _ = parser.parse_args(args)
+
+    sizes = [int(x) for x in options.sizes.split(',')]
+    only = options.benchmarks.split(',') if options.benchmarks else None
+    print('%-16s %10s %10s %14s' % ('benchmark', 'files', 'seconds',
+                                    'files/sec'))
+    results = run(sizes, options.repeat, only, options.lss_python)
+
+    python = platform.python_version()
+    report = {
+        'pyseq': pyseq.__version__,
+        'python': python,
+        'platform': platform.platform(),
+        'date': datetime.now().isoformat(),
+        'repeat': options.repeat,
+        'results': results,
+    }
+    output = options.output or 'results-%s-py%s.json' % (
+        pyseq.__version__, python)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('\nwrote %s' % output)
+
+    if options.compare:
+        with open(options.compare) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
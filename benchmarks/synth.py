@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------------------------
+# Copyright (c) 2011-2017, Ryan Galloway (ryan@rsgalloway.com)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  - Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#  - Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#  - Neither the name of the software nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# -----------------------------------------------------------------------------
+
+"""Generates synthetic render directories for the benchmarks, e.g. ::
+
+    $ python benchmarks/synth.py /tmp/renders 100000
+
+writes 100000 empty files under /tmp/renders. The names mimic a render
+farm's output: multi-version shots like 012_vb_110_v001.1001.exr, tile
+grids like bnc01_TinkSO_tx_0_ty_0.0101.tif, sparse frame ranges, mixed
+padding (unpadded frames and padded frames overflowing their width) and
+single files, laid out in sequence/shot/element directories.
+"""
+
+import os
+import sys
+import random
+
+
+def _frames(rand, first, count, sparse):
+    """Returns `count` frames from `first`, dropping each with probability
+    `sparse`, but always keeping the first one.
+    """
+    frames = [first]
+    for frame in range(first + 1, first + count):
+        if rand.random() >= sparse:
+            frames.append(frame)
+    return frames
+
+
+def _shot(rand, shot, sparse):
+    """Returns the (element directory, file names) of one shot.
+    """
+    kind = rand.randint(0, 9)
+    prefix = '%03d_vb_%03d' % (shot % 1000, shot)
+    if kind < 4:
+        # multi-version renders
+        names = []
+        for version in range(1, rand.randint(2, 4)):
+            for frame in _frames(rand, 1001, rand.randint(10, 200), sparse):
+                names.append('%s_v%03d.%04d.exr' % (prefix, version, frame))
+        return 'render', names
+    if kind < 6:
+        # tile grids
+        names = []
+        frames = _frames(rand, 101, rand.randint(5, 50), sparse)
+        for tx in range(rand.randint(1, 4)):
+            for ty in range(rand.randint(1, 4)):
+                for frame in frames:
+                    names.append('bnc%02d_TinkSO_tx_%d_ty_%d.%04d.tif' % (
+                        shot % 100, tx, ty, frame))
+        return 'tiles', names
+    if kind < 8:
+        # mixed padding: unpadded plates, and padded frames past 99
+        if rand.randint(0, 1):
+            frames = _frames(rand, 1, rand.randint(20, 400), sparse)
+            return 'plates', ['%s_plate.%d.dpx' % (prefix, f) for f in frames]
+        frames = _frames(rand, 90, rand.randint(20, 100), sparse)
+        return 'comp', ['%s_comp.%02d.jpg' % (prefix, f) for f in frames]
+    # single files
+    return 'work', ['%s_v%03d.nk' % (prefix, v)
+                    for v in range(1, rand.randint(2, 6))] + ['notes.txt']
+
+
+def make_names(count, seed=0, sparse=0.05):
+    """Returns a list of `count` synthetic file paths, relative to the
+    root of the tree.
+
+    :param count: number of paths.
+    :param seed: random seed, the same seed gives the same paths.
+    :param sparse: probability of a frame being missing from a sequence.
+    """
+    rand = random.Random(seed)
+    names = []
+    shot = 0
+    while len(names) < count:
+        shot += 1
+        element, files = _shot(rand, shot, sparse)
+        dirname = os.path.join('sq%02d' % (shot // 50), 'sh%04d' % shot,
+                               element)
+        names.extend(os.path.join(dirname, f) for f in files)
+    return names[:count]
+
+
+def make_tree(root, count, seed=0, sparse=0.05):
+    """Writes `count` empty synthetic files under root, see make_names().
+
+    :return: list of the file paths.
+    """
+    paths = [os.path.join(root, name)
+             for name in make_names(count, seed, sparse)]
+    dirs = set()
+    for path in paths:
+        dirname = os.path.dirname(path)
+        if dirname not in dirs:
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            dirs.add(dirname)
+        open(path, 'w').close()
+    return paths
+
+
+def main(args):
+    if len(args) != 2:
+        print('usage: synth.py <root> <count>')
+        return 2
+    paths = make_tree(args[0], int(args[1]))
+    print('wrote %d files under %s' % (len(paths), args[0]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -50,12 +50,47 @@ Docs and latest version available for download at
 
 import os
 import re
+import json
+import mmap
+import errno
+import sys
+import time
+import select
+import struct
 import logging
 import warnings
-import functools
+import bisect
+import heapq
+import itertools
+import tempfile
+import threading
+import multiprocessing
+from array import array
 from glob import glob
 from glob import iglob
-from datetime import datetime
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
 
 __version__ = "0.5.1"
 
@@ -70,15 +105,49 @@ strict_pad = True
 # regex for matching numerical characters
 digits_re = re.compile(r'\d+')
 
+# same, keeping the digits when splitting a name
+digits_split_re = re.compile(r'(\d+)')
+
 # regex for matching format directives
 format_re = re.compile(r'%(?P<pad>\d+)?(?P<var>\w+)')
 
 # character to join explicit frame ranges on
 range_join = os.environ.get('PYSEQ_RANGE_SEP', ', ')
 
+# array typecode used to store frame numbers (64-bit when available)
+try:
+    array('q')
+    frame_typecode = 'q'
+except ValueError:
+    frame_typecode = 'l'
+
+# number of frames from which FrameSet uses numpy, when it is installed
+numpy_threshold = int(os.environ.get('PYSEQ_NUMPY_THRESHOLD', 4096))
+
+# numpy module, imported the first time there are enough frames to use it
+_numpy = None
+
+
+def _import_numpy():
+    """Returns the numpy module, imported on first use so that it does not
+    slow down importing pyseq, or None if it is not installed.
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
 __all__ = [
-    'SequenceError', 'FormatError', 'Item', 'Sequence', 'diff', 'uncompress',
-    'getSequences', 'get_sequences', 'walk'
+    'SequenceError', 'FormatError', 'Item', 'FrameSet', 'Sequence', 'diff',
+    'uncompress', 'getSequences', 'get_sequences', 'walk', 'ScanCache',
+    'SequenceIndex', 'watch', 'write_sequences', 'VirtualSequence',
+    'stat_items', 'stat_sequences', 'resume_reindex', 'rollback_reindex',
+    'Stats', 'stats', 'Snapshot', 'snapshot', 'diff_snapshots', 'dump',
+    'load', 'Manifest', 'MANIFEST_STAT', 'listdir'
 ]
 
 # logging handlers
@@ -103,12 +172,34 @@ else:
     bytes = str
     basestring = basestring
 
+try:
+    intern = intern
+except NameError:
+    from sys import intern
+
+
+def _is_dir_entry(x):
+    """Returns True if x is an os.DirEntry, as returned by scandir().
+    """
+    return not isinstance(x, basestring) and hasattr(x, 'inode') \
+        and hasattr(x, 'is_file')
+
+
+def _str_key(x):
+    """Sort key of get_sequences() source items: os.DirEntry objects sort by
+    path, everything else by its string value.
+    """
+    if _is_dir_entry(x):
+        return x.path
+    return str(x)
+
 
 def _natural_key(x):
     """ Splits a string into characters and digits.  This helps in sorting file
     names in a 'natural' way.
     """
-    return [int(c) if c.isdigit() else c.lower() for c in re.split("(\d+)", x)]
+    return [int(c) if c.isdigit() else c.lower()
+            for c in digits_split_re.split(x)]
 
 
 def _ext_key(x):
@@ -146,6 +237,117 @@ class FormatError(Exception):
     pass
 
 
+# set by stats.enable(), the hot paths only count and time when it is True
+_stats_enabled = False
+
+
+class Stats(object):
+    """Counts the work done by pyseq and times its phases, to see where the
+    time of a scan goes. It is disabled by default, and then costs one flag
+    test in each hot path. Use the module's `stats` instance, e.g. ::
+
+        >>> stats.enable()
+        >>> seqs = get_sequences('./tests/files/')
+        >>> stats.counters['dirs']
+        1
+        >>> print(stats.report())
+
+    Counters:
+
+        items         Items built
+        diff          diff() calls
+        is_sibling    Item.is_sibling() calls
+        stat          os.stat calls for Item size, mtime and stat
+        dirs          directories listed
+        cache_hits    directories read from a ScanCache
+        cache_misses  directories not found in a ScanCache, or changed
+
+    Timings, in seconds:
+
+        list        listing directories and globbing
+        sort        sorting the items
+        group       grouping items into sequences
+        format      formatting sequences
+
+    Hooks added with add_hook() are called with (kind, name, value), kind
+    being 'count' or 'time', as the stats are updated.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__hooks = []
+        self.counters = {}
+        self.timings = {}
+
+    @property
+    def enabled(self):
+        return _stats_enabled
+
+    def enable(self):
+        """Starts counting.
+        """
+        global _stats_enabled
+        _stats_enabled = True
+
+    def disable(self):
+        """Stops counting, the stats are kept until reset().
+        """
+        global _stats_enabled
+        _stats_enabled = False
+
+    def reset(self):
+        """Clears the counters and timings.
+        """
+        with self.__lock:
+            self.counters = {}
+            self.timings = {}
+
+    def add_hook(self, callback):
+        """Calls callback(kind, name, value) on every update.
+        """
+        self.__hooks.append(callback)
+
+    def remove_hook(self, callback):
+        self.__hooks.remove(callback)
+
+    def count(self, name, value=1):
+        """Adds value to the counter name.
+        """
+        with self.__lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for hook in self.__hooks:
+            hook('count', name, value)
+
+    def add_time(self, name, seconds):
+        """Adds seconds to the timing name.
+        """
+        with self.__lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+        for hook in self.__hooks:
+            hook('time', name, seconds)
+
+    def lap(self, name, start):
+        """Adds the time since start to the timing name.
+
+        :return: the current time, to start the next lap from.
+        """
+        now = time.time()
+        self.add_time(name, now - start)
+        return now
+
+    def report(self):
+        """:return: the counters and timings as text, one per line.
+        """
+        lines = ['%-12s %12d' % (name, value)
+                 for name, value in sorted(self.counters.items())]
+        lines.extend('%-12s %12.4fs' % (name, value)
+                     for name, value in sorted(self.timings.items()))
+        return '\n'.join(lines)
+
+
+stats = Stats()
+
+
 def deprecated(func):
     """Deprecation warning decorator
     """
@@ -159,27 +361,81 @@ def deprecated(func):
     return inner
 
 
+def _str_slots():
+    """Returns True if str subclasses support non-empty __slots__ (they do
+    not on python 2).
+    """
+    try:
+        type('_SlotsTest', (str,), {'__slots__': ('x',)})
+    except TypeError:
+        return False
+    return True
+
+
+def _intern(s):
+    """Interns a string so items in the same directory share one dirname.
+    """
+    try:
+        return intern(s)
+    except TypeError:
+        return s
+
+
+def _abspath(path):
+    """Same as os.path.abspath, but skips the normalization of posix paths
+    that are already absolute and normalized.
+    """
+    if os.sep == '/' and path.startswith('/') and '//' not in path \
+            and '/./' not in path and '/../' not in path \
+            and not path.endswith(('/', '/.', '/..')):
+        return path
+    return os.path.abspath(path)
+
+
 class Item(str):
     """Sequence member file class
 
+    The absolute path, name, digits and parts of an Item are resolved the
+    first time they are needed, and only once. Paths relative to the
+    current directory are resolved when first accessed.
+
+    Items can also be created from os.DirEntry objects, in which case the
+    entry's cached file type and stat results are used instead of new
+    system calls.
+
     :param item: Path to file.
     """
 
+    if _str_slots():
+        __slots__ = (
+            'item', 'frame', 'tail', 'pad', '__head', '__path', '__dirname',
+            '__filename', '__digits', '__parts', '__stat'
+        )
+
+    def __new__(cls, item):
+        if not isinstance(item, basestring) and _is_dir_entry(item):
+            return super(Item, cls).__new__(cls, item.path)
+        return super(Item, cls).__new__(cls, item)
+
     def __init__(self, item):
         super(Item, self).__init__()
-        log.debug('adding %s', item)
         self.item = item
-        self.__path = getattr(item, 'path', None)
-        if self.__path is None:
-            self.__path = os.path.abspath(str(item))
-        self.__dirname, self.__filename = os.path.split(self.__path)
-        self.__digits = digits_re.findall(self.name)
-        self.__parts = digits_re.split(self.name)
+        if _is_dir_entry(item):
+            # os.DirEntry paths are relative to the scanned directory
+            self.__path = None
+        else:
+            self.__path = getattr(item, 'path', None)
+        self.__dirname = None
+        self.__filename = None
+        self.__digits = None
+        self.__parts = None
         self.__stat = None
+        if _stats_enabled:
+            stats.count('items')
 
         # modified by self.is_sibling()
         self.frame = None
-        self.head = self.name
+        self.__head = None
         self.tail = ''
         self.pad = None
 
@@ -214,37 +470,70 @@ class Item(str):
     def path(self):
         """Item absolute path, if a filesystem item.
         """
+        if self.__path is None:
+            self.__path = _abspath(_str_key(self.item))
         return self.__path
 
     @property
     def name(self):
         """Item base name attribute
         """
+        if self.__filename is None:
+            self.__split()
         return self.__filename
 
     @property
     def dirname(self):
         """"Item directory name, if a filesystem item."
         """
+        if self.__dirname is None:
+            self.__split()
         return self.__dirname
 
     @property
     def digits(self):
         """Numerical components of item name.
         """
+        if self.__digits is None:
+            self.__split_digits()
         return self.__digits
 
     @property
     def parts(self):
         """Non-numerical components of item name
         """
+        if self.__parts is None:
+            self.__split_digits()
         return self.__parts
 
+    @property
+    def head(self):
+        """String before the sequence number, the whole name until the Item
+        is found to be part of a sequence.
+        """
+        if self.__head is None:
+            return self.name
+        return self.__head
+
+    @head.setter
+    def head(self, value):
+        self.__head = value
+
     @property
     def exists(self):
-        """Returns True if this item exists on disk
+        """Returns True if this item exists on disk, always checked again
+        rather than taken from the listing
         """
-        return os.path.isfile(self.__path)
+        return os.path.isfile(self.path)
+
+    def __split(self):
+        dirname, self.__filename = os.path.split(self.path)
+        self.__dirname = _intern(dirname)
+
+    def __split_digits(self):
+        split = digits_split_re.split(self.name)
+        self.__parts = split[0::2]
+        self.__digits = split[1::2]
 
     @property
     def size(self):
@@ -263,9 +552,23 @@ class Item(str):
         """ Returns the os.stat object for this file.
         """
         if self.__stat is None:
-            self.__stat = os.stat(self.__path)
+            if isinstance(self.item, Item):
+                self.__stat = self.item.stat
+            elif _is_dir_entry(self.item):
+                self.__stat = self.item.stat()
+            else:
+                self.__stat = os.stat(self.path)
+            if _stats_enabled:
+                stats.count('stat')
         return self.__stat
 
+    def _has_stat(self):
+        """Returns True if the stat result is already known.
+        """
+        if isinstance(self.item, Item):
+            return self.item._has_stat()
+        return self.__stat is not None
+
     @deprecated
     def isSibling(self, item):
         """Deprecated: use is_sibling instead
@@ -279,6 +582,8 @@ class Item(str):
 
         :return: True if this and item are sequential siblings.
         """
+        if _stats_enabled:
+            stats.count('is_sibling')
         if not isinstance(item, Item):
             item = Item(item)
 
@@ -288,19 +593,726 @@ class Item(str):
         # I do not understand why we are updating information
         # while this is a predicate method
         if is_sibling:
-            frame = d[0]['frames'][0]
-            self.frame = int(frame)
-            self.pad = len(frame)
-            self.head = self.name[:d[0]['start']]
-            self.tail = self.name[d[0]['end']:]
-            frame = d[0]['frames'][1]
-            item.frame = int(frame)
-            item.pad = len(frame)
-            item.head = item.name[:d[0]['start']]
-            item.tail = item.name[d[0]['end']:]
+            frames = d[0]['frames']
+            start = d[0]['start']
+            self._set_frame(frames[0], start, d[0]['end'])
+            # the digits differ in width when strict_pad is False
+            item._set_frame(frames[1], start, start + len(frames[1]))
 
         return is_sibling
 
+    def _set_frame(self, frame, start, end):
+        """Sets the frame, pad, head and tail from the sequence number
+        digits and their position in the name.
+        """
+        self.frame = int(frame)
+        self.pad = len(frame)
+        self.head = self.name[:start]
+        self.tail = self.name[end:]
+
+    def _clear_frame(self):
+        """Resets the frame, pad, head and tail, as for an Item that is not
+        part of a sequence.
+        """
+        self.frame = None
+        self.pad = None
+        self.head = None
+        self.tail = ''
+
+    def _set_stat(self, stat):
+        """Sets the stat result, e.g. one read from a manifest, so the file
+        is not stat'ed again.
+        """
+        self.__stat = stat
+
+
+class FrameSet(object):
+    """Compact set of frame numbers stored as sorted, inclusive ranges.
+
+    Contiguous frames cost one range no matter how many there are, so the
+    start, end, length and range strings of a sequence are computed in
+    O(number of ranges) instead of O(number of frames). For example:
+
+        >>> fs = FrameSet([1, 2, 3, 6, 5, 10])
+        >>> fs.ranges()
+        [(1, 3), (5, 6), (10, 10)]
+        >>> fs.gaps()
+        [(4, 4), (7, 9)]
+        >>> len(fs), 4 in fs, 5 in fs
+        (6, False, True)
+    """
+
+    def __init__(self, frames=()):
+        """
+        Create a new FrameSet from an iterable of frame numbers, in any order
+        and with duplicates.
+
+        :param frames: iterable of ints.
+        """
+        self.__starts = array(frame_typecode)
+        self.__ends = array(frame_typecode)
+        self.__len = 0
+        self.__offsets = None
+        if isinstance(frames, (list, tuple)) \
+                and len(frames) >= numpy_threshold \
+                and _import_numpy() is not None:
+            self.__init_numpy(frames)
+            return
+        start = end = None
+        for frame in sorted(set(frames)):
+            if end is not None and frame == end + 1:
+                end = frame
+                continue
+            if end is not None:
+                self.__push(start, end)
+            start = end = frame
+        if end is not None:
+            self.__push(start, end)
+
+    def __init_numpy(self, frames):
+        """Finds the ranges of frames with vectorized numpy operations: the
+        runs end where consecutive sorted frames differ by more than one,
+        and repeated frames differ by zero.
+        """
+        if not frames:
+            return
+        numpy = _import_numpy()
+        values = numpy.fromiter(frames, numpy.int64, len(frames))
+        values.sort(kind='stable')
+        steps = numpy.diff(values)
+        breaks = numpy.flatnonzero(steps > 1)
+        starts = values[numpy.concatenate(([0], breaks + 1))]
+        ends = values[numpy.concatenate((breaks, [len(values) - 1]))]
+        self.__starts = array(frame_typecode, starts.tolist())
+        self.__ends = array(frame_typecode, ends.tolist())
+        self.__len = len(values) - int(numpy.count_nonzero(steps == 0))
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """Creates a FrameSet from (start, end) inclusive ranges.
+
+        :param ranges: iterable of (start, end) tuples, in any order.
+
+        :return: FrameSet instance.
+        """
+        fs = cls()
+        for start, end in sorted(ranges):
+            if end < start:
+                raise ValueError('Invalid frame range: %s-%s' % (start, end))
+            if fs.__ends and start <= fs.__ends[-1] + 1:
+                if end > fs.__ends[-1]:
+                    fs.__len += end - fs.__ends[-1]
+                    fs.__ends[-1] = end
+                continue
+            fs.__push(start, end)
+        fs.__offsets = None
+        return fs
+
+    def __push(self, start, end):
+        self.__starts.append(start)
+        self.__ends.append(end)
+        self.__len += end - start + 1
+        self.__offsets = None
+
+    def __get_offsets(self):
+        """Returns the number of frames before each range, cached until the
+        set changes.
+        """
+        if self.__offsets is None:
+            offsets = array(frame_typecode)
+            total = 0
+            for start, end in zip(self.__starts, self.__ends):
+                offsets.append(total)
+                total += end - start + 1
+            self.__offsets = offsets
+        return self.__offsets
+
+    def __len__(self):
+        return self.__len
+
+    def __bool__(self):
+        return self.__len > 0
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        for start, end in zip(self.__starts, self.__ends):
+            for frame in range(start, end + 1):
+                yield frame
+
+    def __contains__(self, frame):
+        i = bisect.bisect_right(self.__starts, frame) - 1
+        return i >= 0 and frame <= self.__ends[i]
+
+    def __getitem__(self, index):
+        """Returns the frame at index in sorted order, in O(log number of
+        ranges), or a list of frames for a slice.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.__len))]
+        if index < 0:
+            index += self.__len
+        if not 0 <= index < self.__len:
+            raise IndexError('FrameSet index out of range')
+        offsets = self.__get_offsets()
+        i = bisect.bisect_right(offsets, index) - 1
+        return self.__starts[i] + index - offsets[i]
+
+    def index(self, frame):
+        """:return: index of frame in sorted order.
+
+        :exc:`ValueError` raised if frame is not in the set.
+        """
+        i = bisect.bisect_right(self.__starts, frame) - 1
+        if i < 0 or frame > self.__ends[i]:
+            raise ValueError('%s is not in FrameSet' % frame)
+        return self.__get_offsets()[i] + frame - self.__starts[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple)):
+            # equal to the sorted list of its frames
+            return len(other) == self.__len and list(self) == list(other)
+        if not isinstance(other, FrameSet):
+            return NotImplemented
+        return self.ranges() == other.ranges()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __str__(self):
+        return _format_ranges(self.ranges())
+
+    def __repr__(self):
+        return '<pyseq.FrameSet "%s">' % self
+
+    def start(self):
+        """:return: First frame number, or None if empty."""
+        if self.__starts:
+            return self.__starts[0]
+
+    def end(self):
+        """:return: Last frame number, or None if empty."""
+        if self.__ends:
+            return self.__ends[-1]
+
+    def ranges(self):
+        """:return: List of (start, end) inclusive ranges."""
+        return list(zip(self.__starts, self.__ends))
+
+    def gaps(self):
+        """:return: List of (start, end) inclusive ranges of missing frames
+        between the first and last frame."""
+        return [(end + 1, start - 1) for end, start in
+                zip(self.__ends, self.__starts[1:])]
+
+    def union(self, other):
+        """:return: new FrameSet of the frames in either set."""
+        return FrameSet.from_ranges(self.ranges() + other.ranges())
+
+    def intersection(self, other):
+        """:return: new FrameSet of the frames in both sets."""
+        ranges = []
+        a, b = self.ranges(), other.ranges()
+        i = j = 0
+        while i < len(a) and j < len(b):
+            start = max(a[i][0], b[j][0])
+            end = min(a[i][1], b[j][1])
+            if start <= end:
+                ranges.append((start, end))
+            # move past the range that ends first
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return FrameSet.from_ranges(ranges)
+
+    def difference(self, other):
+        """:return: new FrameSet of the frames not in other."""
+        ranges = []
+        b = other.ranges()
+        j = 0
+        for start, end in self.ranges():
+            # skip the ranges of other that end before this one
+            while j < len(b) and b[j][1] < start:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] <= end:
+                if b[k][0] > start:
+                    ranges.append((start, b[k][0] - 1))
+                start = max(start, b[k][1] + 1)
+                k += 1
+            if start <= end:
+                ranges.append((start, end))
+        return FrameSet.from_ranges(ranges)
+
+    def symmetric_difference(self, other):
+        """:return: new FrameSet of the frames in one set only."""
+        return self.union(other).difference(self.intersection(other))
+
+    def issubset(self, other):
+        """:return: True if every frame is also in other."""
+        return not self.difference(other)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+    __le__ = issubset
+
+    def add(self, frame):
+        """Adds a frame number, merging it with neighbouring ranges.
+        """
+        starts = self.__starts
+        ends = self.__ends
+        i = bisect.bisect_right(starts, frame) - 1
+        if i >= 0 and frame <= ends[i]:
+            return
+        joins_left = i >= 0 and ends[i] == frame - 1
+        joins_right = i + 1 < len(starts) and starts[i + 1] == frame + 1
+        if joins_left and joins_right:
+            ends[i] = ends[i + 1]
+            del starts[i + 1]
+            del ends[i + 1]
+        elif joins_left:
+            ends[i] = frame
+        elif joins_right:
+            starts[i + 1] = frame
+        else:
+            starts.insert(i + 1, frame)
+            ends.insert(i + 1, frame)
+        self.__len += 1
+        self.__offsets = None
+
+    def discard(self, frame):
+        """Removes a frame number if present, splitting its range.
+        """
+        starts = self.__starts
+        ends = self.__ends
+        i = bisect.bisect_right(starts, frame) - 1
+        if i < 0 or frame > ends[i]:
+            return
+        start, end = starts[i], ends[i]
+        if start == end:
+            del starts[i]
+            del ends[i]
+        elif frame == start:
+            starts[i] = frame + 1
+        elif frame == end:
+            ends[i] = frame - 1
+        else:
+            ends[i] = frame - 1
+            starts.insert(i + 1, frame + 1)
+            ends.insert(i + 1, end)
+        self.__len -= 1
+        self.__offsets = None
+
+
+# format directive -> (conversion type, function returning its value)
+format_directives = {
+    's': ('i', lambda seq: seq.start()),
+    'e': ('i', lambda seq: seq.end()),
+    'l': ('i', lambda seq: seq.length()),
+    'f': ('s', lambda seq: seq.frames()),
+    'm': ('s', lambda seq: _format_frame_list(seq.frameset().gaps())),
+    'M': ('s', lambda seq: seq._get_ranges(seq.frameset().gaps())),
+    'p': ('s', lambda seq: seq._get_padding()),
+    'r': ('s', lambda seq: seq._get_range()),
+    'R': ('s', lambda seq: seq._get_ranges(seq.frameset().ranges())),
+    'd': ('s', lambda seq: seq.size),
+    'D': ('s', lambda seq: seq.directory()),
+    'h': ('s', lambda seq: seq.head()),
+    't': ('s', lambda seq: seq.tail()),
+}
+
+
+class _Format(object):
+    """Format string compiled into its literal text and directives, so
+    formatting a sequence only evaluates the directives that are used.
+    """
+
+    def __init__(self, fmt):
+        # list of literal strings and (conversion, function) tuples
+        self.parts = []
+        end = 0
+        for m in format_re.finditer(fmt):
+            var = m.group('var')
+            try:
+                char_type, func = format_directives[var]
+            except KeyError:
+                raise FormatError("Bad directive: %%%s" % var)
+            self.__literal(fmt[end:m.start()])
+            self.parts.append(('%' + (m.group('pad') or '') + char_type,
+                               func))
+            end = m.end()
+        self.__literal(fmt[end:])
+
+    def __literal(self, text):
+        if text:
+            self.parts.append(text.replace('%%', '%'))
+
+    def render(self, seq):
+        """:return: the format string filled in from seq."""
+        values = {}
+        out = []
+        for part in self.parts:
+            if isinstance(part, tuple):
+                conversion, func = part
+                # only evaluate each directive once, just in case
+                value = values.get(func)
+                if value is None:
+                    value = values[func] = func(seq)
+                part = conversion % (value,)
+            out.append(part)
+        return ''.join(out)
+
+
+# compiled format strings, see _compile_format()
+_formats = {}
+
+
+def _compile_format(fmt):
+    """Returns the compiled _Format of a format string, cached.
+    """
+    compiled = _formats.get(fmt)
+    if compiled is None:
+        if len(_formats) > 256:
+            _formats.clear()
+        compiled = _formats[fmt] = _Format(fmt)
+    return compiled
+
+
+def write_sequences(seqs, stream=None, fmt=global_format):
+    """Writes one line per sequence to a stream, compiling the format
+    string once for all of them.
+
+        >>> write_sequences(get_sequences('./tests/files/'), fmt='%h%r%t')
+
+    :param seqs: iterable of pyseq.Sequence objects.
+    :param stream: file-like object, defaults to sys.stdout.
+    :param fmt: Format string, see :meth:`Sequence.format`.
+    """
+    if stream is None:
+        stream = sys.stdout
+    render = _compile_format(fmt).render
+    write = stream.write
+    timing = _stats_enabled
+    if timing:
+        start = time.time()
+    for seq in seqs:
+        write(render(seq) + '\n')
+    if timing:
+        stats.lap('format', start)
+
+
+# number of threads used to stat the items of sequences
+stat_jobs = int(os.environ.get('PYSEQ_STAT_JOBS', 16))
+
+# least number of items each stat thread gets, fewer are stat'ed inline
+stat_batch_size = 32
+
+
+def stat_items(items, jobs=None):
+    """Stats items on a pool of threads and stores the results on them, so
+    that reading the size or mtime of many files on a network filesystem
+    does not wait for each request in turn. Items that already have their
+    stat result, or that cannot be stat'ed, are skipped. Threads are only
+    started for more than stat_batch_size items.
+
+    :param items: list of pyseq.Item objects.
+    :param jobs: number of threads, defaults to $PYSEQ_STAT_JOBS or 16.
+    """
+    items = [i for i in items if not i._has_stat()]
+    jobs = min(jobs or stat_jobs, len(items) // stat_batch_size)
+    if jobs < 2:
+        chunks = [items]
+    else:
+        chunks = [items[i::jobs] for i in range(jobs)]
+
+    def work(chunk):
+        for item in chunk:
+            try:
+                item.stat
+            except OSError:
+                pass
+
+    threads = [threading.Thread(target=work, args=(x,)) for x in chunks[1:]]
+    for thread in threads:
+        thread.start()
+    work(chunks[0])
+    for thread in threads:
+        thread.join()
+
+
+def stat_sequences(seqs, jobs=None):
+    """Stats the items of all the sequences at once, see stat_items(), for
+    example before formatting them with %d:
+
+        >>> seqs = get_sequences('./tests/files/')
+        >>> stat_sequences(seqs)
+        >>> for s in seqs: print(s.format('%h%r%t %d'))
+
+    Virtual sequences are skipped, their items are created on demand.
+
+    :param seqs: list of pyseq.Sequence objects.
+    :param jobs: number of threads, defaults to $PYSEQ_STAT_JOBS or 16.
+    """
+    stat_items([i for seq in seqs if not isinstance(seq, VirtualSequence)
+                for i in seq], jobs)
+
+
+# number of threads used to rename the items of a sequence
+rename_jobs = int(os.environ.get('PYSEQ_RENAME_JOBS', 8))
+
+
+def _rename_plan(renames):
+    """Checks a list of (src, dst) renames and orders them in waves that
+    can each run concurrently. Renames onto a free name go first; renames
+    onto a name that another rename moves away, which includes chains and
+    cycles, go through a temporary name in the same directory, so any plan
+    takes two waves however the frames overlap.
+
+    :param renames: list of (src, dst) paths.
+
+    :raises SequenceError: if two renames have the same destination, or a
+        destination or temporary name already exists and is not renamed.
+
+    :return: (steps, waves), the list of (src, dst) steps and the lists of
+        step indices in each wave.
+    """
+    sources = set(src for src, dst in renames)
+    targets = set()
+    direct, chained = [], []
+    for src, dst in renames:
+        if dst in targets:
+            raise SequenceError('Two items would be renamed to %s' % dst)
+        targets.add(dst)
+        if dst in sources:
+            chained.append((src, dst))
+        elif os.path.lexists(dst):
+            raise SequenceError('%s already exists' % dst)
+        else:
+            direct.append((src, dst))
+
+    steps = list(direct)
+    second = []
+    for src, dst in chained:
+        dirname, filename = os.path.split(src)
+        temp = os.path.join(dirname, '.%s.reindex' % filename)
+        if temp in sources or temp in targets or os.path.lexists(temp):
+            raise SequenceError('%s already exists' % temp)
+        steps.append((src, temp))
+        second.append((temp, dst))
+    first = list(range(len(steps)))
+    steps.extend(second)
+    waves = [first, list(range(len(first), len(steps)))]
+    return steps, [wave for wave in waves if wave]
+
+
+def _rename_wave(steps, wave, done, journal=None, jobs=None, undo=False):
+    """Runs the renames of one wave on a pool of threads, recording each
+    step in the journal as soon as it is done. The other threads stop at
+    the first error, which is raised once they have all finished.
+
+    :param steps: list of (src, dst) paths.
+    :param wave: indices of the steps to run, skipping those in done.
+    :param done: set of indices of the steps done, updated in place.
+    :param journal: open journal file, or None.
+    :param jobs: number of threads, defaults to $PYSEQ_RENAME_JOBS or 8.
+    :param undo: rename the done steps back from dst to src instead.
+    """
+    if undo:
+        wave = [i for i in wave if i in done]
+    else:
+        wave = [i for i in wave if i not in done]
+    jobs = min(jobs or rename_jobs, len(wave))
+    if jobs < 2:
+        chunks = [wave]
+    else:
+        chunks = [wave[i::jobs] for i in range(jobs)]
+    lock = threading.Lock()
+    errors = []
+
+    def work(chunk):
+        for index in chunk:
+            if errors:
+                return
+            src, dst = steps[index]
+            if undo:
+                src, dst = dst, src
+            try:
+                os.rename(src, dst)
+            except OSError as err:
+                # renamed before an interruption left it out of the journal
+                if (err.errno != errno.ENOENT or os.path.lexists(src)
+                        or not os.path.lexists(dst)):
+                    errors.append(err)
+                    return
+            log.debug('renaming %s %s' % (src, dst))
+            with lock:
+                if undo:
+                    done.discard(index)
+                    entry = -index - 1
+                else:
+                    done.add(index)
+                    entry = index
+                if journal is not None:
+                    journal.write('%d\n' % entry)
+                    journal.flush()
+
+    threads = [threading.Thread(target=work, args=(x,)) for x in chunks[1:]]
+    for thread in threads:
+        thread.start()
+    try:
+        work(chunks[0])
+    finally:
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _run_renames(steps, waves, done, journal_path, jobs=None):
+    """Runs the renames wave by wave, journaled in journal_path. If one
+    fails, the steps done are renamed back and the journal is removed.
+
+    :raises SequenceError: if a rename fails.
+    """
+    journal = open(journal_path, 'a')
+    try:
+        try:
+            for wave in waves:
+                _rename_wave(steps, wave, done, journal, jobs)
+        except OSError as err:
+            try:
+                for wave in reversed(waves):
+                    _rename_wave(steps, wave, done, journal, jobs, undo=True)
+            except OSError as undo_err:
+                raise SequenceError(
+                    '%s, rolling back failed: %s, see %s'
+                    % (err, undo_err, journal_path))
+            journal.close()
+            os.remove(journal_path)
+            raise SequenceError('%s, renames rolled back' % err)
+    finally:
+        journal.close()
+    os.remove(journal_path)
+
+
+def _write_journal(journal_path, steps, waves):
+    """Writes the rename plan as the first line of a new journal.
+    """
+    with open(journal_path, 'w') as journal:
+        journal.write(json.dumps({'steps': steps, 'waves': waves}) + '\n')
+
+
+def _read_journal(journal_path):
+    """Reads a journal written by _write_journal() and _rename_wave().
+
+    :return: (steps, waves, done).
+    """
+    with open(journal_path) as journal:
+        try:
+            plan = json.loads(journal.readline())
+            steps = [tuple(step) for step in plan['steps']]
+            waves = plan['waves']
+        except (ValueError, KeyError, TypeError):
+            raise SequenceError('%s is not a reindex journal' % journal_path)
+        done = set()
+        for line in journal:
+            if not line.endswith('\n'):
+                # torn write, the rename is found again when it is run
+                break
+            try:
+                entry = int(line)
+            except ValueError:
+                continue
+            if entry < 0:
+                done.discard(-entry - 1)
+            else:
+                done.add(entry)
+    return steps, waves, done
+
+
+def resume_reindex(journal_path, jobs=None):
+    """Finishes a Sequence.reIndex() that was interrupted, running the
+    renames its journal does not record as done, e.g. ::
+
+        >>> resume_reindex('/path/to/.a.reindex')
+
+    :param journal_path: path to the journal left by reIndex().
+    :param jobs: number of threads, defaults to $PYSEQ_RENAME_JOBS or 8.
+
+    :raises SequenceError: if a rename fails, after rolling back.
+    """
+    steps, waves, done = _read_journal(journal_path)
+    _run_renames(steps, waves, done, journal_path, jobs)
+
+
+def rollback_reindex(journal_path, jobs=None):
+    """Undoes a Sequence.reIndex() that was interrupted, renaming back the
+    files its journal records as renamed, e.g. ::
+
+        >>> rollback_reindex('/path/to/.a.reindex')
+
+    :param journal_path: path to the journal left by reIndex().
+    :param jobs: number of threads, defaults to $PYSEQ_RENAME_JOBS or 8.
+
+    :raises SequenceError: if a rename fails, the journal is then kept.
+    """
+    steps, waves, done = _read_journal(journal_path)
+    journal = open(journal_path, 'a')
+    try:
+        for wave in reversed(waves):
+            _rename_wave(steps, wave, done, journal, jobs, undo=True)
+    except OSError as err:
+        raise SequenceError('%s, see %s' % (err, journal_path))
+    finally:
+        journal.close()
+    os.remove(journal_path)
+
+
+def _expand_ranges(ranges):
+    """Returns the list of frames in (start, end) inclusive ranges, built
+    with numpy when it is installed and there are many frames.
+    """
+    total = sum(end - start + 1 for start, end in ranges)
+    numpy = _import_numpy() if total >= numpy_threshold else None
+    if numpy is None:
+        frames = []
+        for start, end in ranges:
+            frames.extend(range(start, end + 1))
+        return frames
+    starts = numpy.array([r[0] for r in ranges], dtype=numpy.int64)
+    lengths = numpy.array([r[1] - r[0] + 1 for r in ranges],
+                          dtype=numpy.int64)
+    # offset of each frame from the start of its range, added to the start
+    offsets = numpy.cumsum(lengths) - lengths
+    frames = numpy.arange(total, dtype=numpy.int64) + \
+        numpy.repeat(starts - offsets, lengths)
+    return frames.tolist()
+
+
+def _format_frame_list(ranges):
+    """Returns the frames in (start, end) inclusive ranges as a list would
+    print, e.g. [(1, 2), (4, 4)] -> '[1, 2, 4]', without building the list.
+    """
+    return '[%s]' % ', '.join(
+        str(frame) for start, end in ranges for frame in range(start, end + 1)
+    )
+
+
+def _format_ranges(ranges):
+    """Returns a frame range string from (start, end) inclusive ranges,
+    e.g. [(1, 3), (6, 6)] -> '1-3, 6', joined on $PYSEQ_RANGE_SEP.
+    """
+    return range_join.join(
+        str(start) if start == end else '%s-%s' % (start, end)
+        for start, end in ranges
+    )
+
 
 class Sequence(list):
     """Extends list class with methods that handle item sequentialness.
@@ -334,9 +1346,12 @@ class Sequence(list):
         # otherwise Sequence consumes the list
         items = items[::]
         super(Sequence, self).__init__([Item(items.pop(0))])
-        self.__missing = []
-        self.__dirty = False
+        self.__frameset = None
         self.__frames = None
+        self.__by_frame = None
+        self.__missing = None
+        self.__size = None
+        self.__mtime = None
 
         while items:
             f = Item(items.pop(0))
@@ -350,24 +1365,6 @@ class Sequence(list):
                 log.info("Stopping.")
                 break
 
-    def __attrs__(self):
-        """Replaces format directives with callables to get their values."""
-        return {
-            'l': self.length,
-            's': self.start,
-            'e': self.end,
-            'f': self.frames,
-            'm': self.missing,
-            'M': functools.partial(self._get_framerange, self.missing(), missing=True),
-            'd': lambda *x: self.size,
-            'D': self.directory,
-            'p': self._get_padding,
-            'r': functools.partial(self._get_framerange, self.frames(), missing=False),
-            'R': functools.partial(self._get_framerange, self.frames(), missing=True),
-            'h': self.head,
-            't': self.tail
-        }
-
     def __str__(self):
         return self.format(default_format)
 
@@ -378,32 +1375,63 @@ class Sequence(list):
         return getattr(self[0], key)
 
     def __contains__(self, item):
-        super(Sequence, self).__contains__(Item(item))
+        if not isinstance(item, Item):
+            item = Item(item)
+        if not self.includes(item):
+            return False
+        found = self.find(item.frame)
+        if found is None:
+            return False
+        if found == item:
+            return True
+        # frames can repeat when strict_pad is False, e.g. 1 and 01
+        return super(Sequence, self).__contains__(item)
+
+    def __delitem__(self, index):
+        super(Sequence, self).__delitem__(index)
+        self._reset_frames()
+
+    def __delslice__(self, start, end):
+        super(Sequence, self).__delslice__(start, end)
+        self._reset_frames()
 
     def __setitem__(self, index, item):
         """ Used to set a particular element in the sequence
         """
+        if isinstance(index, slice):
+            # python 3 has no __setslice__, slices are set here
+            super(Sequence, self).__setitem__(index, self.__slice_items(item))
+            self._reset_frames()
+            return
         if type(item) is not Item:
             item = Item(item)
         if self.includes(item):
+            old = self[index]
             super(Sequence, self).__setitem__(index, item)
-            self.__frames = None
-            self.__missing = None
+            self._remove_frame(old)
+            self._add_frame(item)
         else:
             raise SequenceError("Item is not a member of sequence.")
 
     def __setslice__(self, start, end, item):
+        item = self.__slice_items(item)
+        super(Sequence, self).__setslice__(start, end, item)
+        self._reset_frames()
+
+    def __slice_items(self, item):
+        """:return: the list of items to set a slice to, raises
+        SequenceError if they are not members of the sequence.
+        """
         if isinstance(item, basestring):
             item = Sequence([item])
         if isinstance(item, list) is False:
             raise TypeError("Invalid type to add to sequence")
+        item = [i if type(i) is Item else Item(i) for i in item]
         for i in item:
             if self.includes(i) is False:
                 raise SequenceError("Item (%s) is not a member of sequence."
                                     % i)
-        super(Sequence, self).__setslice__(start, end, item)
-        self.__frames = None
-        self.__missing = None
+        return item
 
     def __add__(self, item):
         """ return a new sequence with the item appended.  Accepts an Item,
@@ -465,58 +1493,38 @@ class Sequence(list):
 
         :return: Formatted string.
         """
-        format_char_types = {
-            's': 'i',
-            'e': 'i',
-            'l': 'i',
-            'f': 's',
-            'm': 's',
-            'M': 's',
-            'p': 's',
-            'r': 's',
-            'R': 's',
-            'd': 's',
-            'D': 's',
-            'h': 's',
-            't': 's'
-        }
-
-        atts = self.__attrs__()
-        for m in format_re.finditer(fmt):
-            var = m.group('var')
-            pad = m.group('pad')
-            try:
-                fmt_char = format_char_types[var]
-            except KeyError as err:
-                raise FormatError("Bad directive: %%%s" % var)
-            _old = '%s%s' % (pad or '', var)
-            _new = '(%s)%s%s' % (var, pad or '', fmt_char)
-            fmt = fmt.replace(_old, _new)
-            val = atts[var]
-            # only execute the callable once, just in case
-            if callable(val):
-                val = atts[var]()
-                atts[var] = val
-
-        return fmt % atts
+        if _stats_enabled:
+            start = time.time()
+            text = _compile_format(fmt).render(self)
+            stats.lap('format', start)
+            return text
+        return _compile_format(fmt).render(self)
 
     @property
     def mtime(self):
         """Returns the latest mtime of all items
         """
-        maxDate = list()
-        for i in self:
-            maxDate.append(i.mtime)
-        return max(maxDate)
+        if self.__mtime is None:
+            self.__stat_items()
+        return self.__mtime
 
     @property
     def size(self):
         """Returns the size all items (divide by 1024*1024 for MBs)
         """
-        tempSize = list()
-        for i in self:
-            tempSize.append(i.size)
-        return sum(tempSize)
+        if self.__size is None:
+            self.__stat_items()
+        return self.__size
+
+    def __stat_items(self):
+        """Stats all the items concurrently, see stat_items(), and computes
+        the total size and latest mtime.
+        """
+        items = list(self)
+        stat_items(items)
+        stats = [i.stat for i in items]
+        self.__size = sum(x.st_size for x in stats)
+        self.__mtime = max(x.st_mtime for x in stats)
 
     def directory(self):
         return self[0].dirname + os.sep
@@ -526,34 +1534,116 @@ class Sequence(list):
         return len(self)
 
     def frames(self):
-        """:return: List of files in sequence."""
-        if not hasattr(self, '__frames') or not self.__frames or self.__dirty:
+        """:return: Sorted list of the frame numbers in sequence, kept up to
+        date as items are added."""
+        if self.__frames is None:
             self.__frames = self._get_frames()
             self.__frames.sort()
         return self.__frames
 
+    def find(self, frame):
+        """Looks up the item of a frame number, e.g. ::
+
+            >>> s = Sequence(['fileA.0001.jpg', 'fileA.0002.jpg'])
+            >>> print(s.find(2))
+            fileA.0002.jpg
+
+        :param frame: frame number.
+
+        :return: the pyseq.Item of frame, or None.
+        """
+        if self.__by_frame is None:
+            by_frame = {}
+            for item in self:
+                if item.frame is not None:
+                    by_frame.setdefault(item.frame, item)
+            self.__by_frame = by_frame
+        return self.__by_frame.get(frame)
+
+    def frameset(self):
+        """:return: :class:`.FrameSet` of the frame numbers in sequence."""
+        if self.__frameset is None:
+            self.__frameset = FrameSet(self.frames())
+        return self.__frameset
+
     def start(self):
         """:return: First index number in sequence
         """
-        try:
-            return self.frames()[0]
-        except IndexError:
+        start = self.frameset().start()
+        if start is None:
             return 0
+        return start
 
     def end(self):
         """:return: Last index number in sequence
         """
-        try:
-            return self.frames()[-1]
-        except IndexError:
+        end = self.frameset().end()
+        if end is None:
             return 0
+        return end
+
+    def missing(self, expand=False):
+        """Missing frame numbers between the start and end of the sequence,
+        e.g. ::
+
+            >>> s = Sequence(['a.000000001.exr', 'a.000000003.exr',
+            ...               'a.100000000.exr'])
+            >>> s.missing().ranges()
+            [(2, 2), (4, 99999999)]
+
+        :param expand: return the frames as a list instead.
 
-    def missing(self):
-        """:return: List of missing files."""
-        if not hasattr(self, '__missing') or not self.__missing:
-            self.__missing = self._get_missing()
+        :return: :class:`.FrameSet` of the missing frames, built from the
+            gaps between frame ranges so it does not depend on their number.
+        """
+        if self.__missing is None:
+            self.__missing = FrameSet.from_ranges(self.frameset().gaps())
+        if expand:
+            return self._get_missing()
         return self.__missing
 
+    def union(self, other):
+        """Frames in this sequence or other, e.g. rendered and delivered
+        plates combined ::
+
+            >>> a = uncompress('a.%04d.exr 1-10', fmt='%h%p%t %r')
+            >>> b = uncompress('a.%04d.exr 5-20', fmt='%h%p%t %r')
+            >>> print(a.union(b))
+            a.1-20.exr
+
+        The operations work on the frame ranges, not on the items, so they
+        cost as much as the number of ranges.
+
+        :param other: Sequence with the same head, padding and tail.
+
+        :return: :class:`.VirtualSequence` of the frames, in the directory
+            of this sequence.
+
+        :exc:`SequenceError` raised if the sequences do not match.
+        """
+        return self._frame_algebra(other, FrameSet.union)
+
+    def intersection(self, other):
+        """Frames in both this sequence and other, see union()."""
+        return self._frame_algebra(other, FrameSet.intersection)
+
+    def difference(self, other):
+        """Frames in this sequence but not in other, e.g. the frames not
+        delivered yet, see union()."""
+        return self._frame_algebra(other, FrameSet.difference)
+
+    def symmetric_difference(self, other):
+        """Frames in only one of this sequence and other, see union()."""
+        return self._frame_algebra(other, FrameSet.symmetric_difference)
+
+    def issubset(self, other):
+        """:return: True if every frame of this sequence is in other.
+
+        :exc:`SequenceError` raised if the sequences do not match.
+        """
+        self._check_layout(other)
+        return self.frameset().issubset(other.frameset())
+
     def head(self):
         """:return: String before the sequence index number."""
         return self[0].head
@@ -585,13 +1675,18 @@ class Sequence(list):
             if not isinstance(item, Item):
                 item = Item(item)
             if self[-1] != item:
-                return self[-1].is_sibling(item)
+                other = self[-1]
             elif self[0] != item:
-                return self[0].is_sibling(item)
+                other = self[0]
             else:
                 # it should be the only item in the list
-                if self[0] == item:
-                    return True
+                return True
+            frame = other.frame
+            is_sibling = other.is_sibling(item)
+            # is_sibling() sets the frame of the item of a one item sequence
+            if is_sibling and other.frame != frame:
+                self._reset_frames()
+            return is_sibling
 
         return True
 
@@ -633,8 +1728,7 @@ class Sequence(list):
 
         if self.includes(item):
             super(Sequence, self).append(item)
-            self.__frames = None
-            self.__missing = None
+            self._add_frame(item)
         else:
             raise SequenceError('Item is not a member of this sequence')
 
@@ -648,8 +1742,7 @@ class Sequence(list):
 
         if self.includes(item):
             super(Sequence, self).insert(index, item)
-            self.__frames = None
-            self.__missing = None
+            self._add_frame(item)
         else:
             raise SequenceError("Item is not a member of this sequence.")
 
@@ -665,51 +1758,195 @@ class Sequence(list):
 
             if self.includes(item):
                 super(Sequence, self).append(item)
-                self.__frames = None
-                self.__missing = None
+                self._add_frame(item)
             else:
                 raise SequenceError("Item (%s) is not a member of this "
                                     "sequence." % item)
 
-    def reIndex(self, offset, padding=None):
-        """Renames and reindexes the items in the sequence, e.g. ::
+    def pop(self, index=-1):
+        """Removes and returns the item at index (default last).
+        """
+        item = super(Sequence, self).pop(index)
+        self._remove_frame(item)
+        return item
+
+    def remove(self, item):
+        """Removes the first occurrence of item.
+        """
+        super(Sequence, self).remove(item)
+        self._reset_frames()
+
+    def reIndex(self, offset, padding=None, jobs=None, journal=None):
+        """Renames and reindexes the items in the sequence, e.g. ::
 
             >>> seq.reIndex(offset=100)
 
         will add a 100 frame offset to each Item in `seq`, and rename
         the files on disk.
 
+        The renames are all planned and checked before any file is moved,
+        then run concurrently. They are recorded in a journal, by default
+        a hidden file next to the sequence, which is removed when they are
+        done. If a rename fails the others are undone; if the process is
+        interrupted, use resume_reindex() or rollback_reindex() on the
+        journal.
+
         :param offset: the frame offset to apply to each item
         :param padding: change the padding
+        :param jobs: number of threads, defaults to $PYSEQ_RENAME_JOBS or 8.
+        :param journal: path to the journal file.
+
+        :raises SequenceError: if a file would be overwritten, or a rename
+            fails.
         """
+        if not self.format("%p"):
+            # e.g. a single file, there are no frame numbers to change
+            return
         if not padding:
             padding = self.format("%p")
+        head = self.head()
+        tail = self.tail()
+
+        renames = []
+        items = []
+        for item in self:
+            newFrame = padding % (item.frame + offset)
+            newName = os.path.join(item.dirname,
+                                   "%s%s%s" % (head, newFrame, tail))
+            items.append((newName, newFrame))
+            if newName != item.path:
+                renames.append((item.path, newName))
+
+        if renames:
+            steps, waves = _rename_plan(renames)
+            if journal is None:
+                journal = os.path.join(self[0].dirname,
+                                       '.%s%s.reindex' % (head, tail))
+            if os.path.lexists(journal):
+                raise SequenceError('%s already exists' % journal)
+            _write_journal(journal, steps, waves)
+            _run_renames(steps, waves, set(), journal, jobs)
+
+        for index, (newName, newFrame) in enumerate(items):
+            item = Item(newName)
+            item.frame = int(newFrame)
+            item.pad = len(newFrame)
+            item.head = head
+            item.tail = tail
+            super(Sequence, self).__setitem__(index, item)
+        self._reset_frames()
 
-        if offset > 0:
-            gen = ((image, frame) for (image, frame) in zip(reversed(self),
-                reversed(self.frames())))
-        else:
-            gen = ((image, frame) for (image, frame) in zip(self, self.frames()))
+    def _append_sibling(self, item):
+        """Appends an Item already known to be a sibling of the last item,
+        skipping the membership test.
+        """
+        super(Sequence, self).append(item)
+        self._add_frame(item)
 
-        for image, frame in gen:
-            oldName = image.path
-            newFrame = padding % (frame + offset)
-            newFileName = "%s%s%s" % (self.format("%h"), newFrame,
-                self.format("%t"))
-            newName = os.path.join(image.dirname, newFileName)
+    def _insert_sibling(self, item):
+        """Inserts an Item already known to be a sibling at its place in
+        frame order.
 
-            try:
-                import shutil
-                shutil.move(oldName, newName)
-            except Exception as err:
-                log.error(err)
+        :return: index of the inserted item.
+        """
+        index = bisect.bisect_right(self, item)
+        super(Sequence, self).insert(index, item)
+        self._add_frame(item)
+        return index
+
+    def _remove_sibling(self, index):
+        """Removes the Item at index.
+
+        :return: the removed item.
+        """
+        item = super(Sequence, self).pop(index)
+        self._remove_frame(item)
+        return item
+
+    def _add_frame(self, item):
+        """Adds the frame of a new item to the cached frames, FrameSet and
+        frame lookup instead of resetting them.
+        """
+        frame = item.frame
+        if frame is None:
+            self._reset_frames()
+            return
+        frames = self.__frames
+        if frames is not None:
+            if not frames or frame >= frames[-1]:
+                frames.append(frame)
             else:
-                log.debug('renaming %s %s' % (oldName, newName))
-                self.__dirty = True
-                image.frame = int(newFrame)
+                bisect.insort(frames, frame)
+        if self.__frameset is not None:
+            self.__frameset.add(frame)
+        if self.__by_frame is not None:
+            self.__by_frame.setdefault(frame, item)
+        self.__missing = None
+        self.__size = None
+        self.__mtime = None
 
-        else:
-            self.frames()
+    def _remove_frame(self, item):
+        """Removes the frame of a removed item from the cached frames,
+        FrameSet and frame lookup instead of resetting them.
+        """
+        frame = item.frame
+        frames = self.__frames
+        if frame is None:
+            self._reset_frames()
+            return
+        self.__missing = None
+        self.__size = None
+        self.__mtime = None
+        if frames is None:
+            # the FrameSet is only cached along with the frames
+            self.__by_frame = None
+            return
+        index = bisect.bisect_left(frames, frame)
+        del frames[index]
+        # frames can repeat when strict_pad is False, e.g. 1 and 01
+        repeated = frames[index:index + 1] == [frame]
+        if self.__frameset is not None and not repeated:
+            self.__frameset.discard(frame)
+        if self.__by_frame is not None and \
+                self.__by_frame.get(frame) is item:
+            if repeated:
+                self.__by_frame = None
+            else:
+                del self.__by_frame[frame]
+
+    def _reset_frames(self):
+        """Clears the cached frames, called whenever items are changed.
+        """
+        self.__frameset = None
+        self.__frames = None
+        self.__by_frame = None
+        self.__missing = None
+        self.__size = None
+        self.__mtime = None
+
+    def _layout(self):
+        """:return: (head, padding, tail) of the sequence."""
+        return self.head(), self._get_padding(), self.tail()
+
+    def _check_layout(self, other):
+        """Raises SequenceError unless other has the same head, padding and
+        tail, and they have frame numbers.
+        """
+        layout = self._layout()
+        if not layout[1]:
+            raise SequenceError('%s has no frame numbers' % self)
+        if other._layout() != layout:
+            raise SequenceError('%s and %s do not match' % (self, other))
+
+    def _frame_algebra(self, other, operation):
+        """Returns a VirtualSequence of operation(frameset, other frameset).
+        """
+        self._check_layout(other)
+        head, pad, tail = self._layout()
+        dirname = self[0].dirname if len(self) else ''
+        return VirtualSequence(head, pad, tail,
+                               operation(self.frameset(), other.frameset()),
+                               dirname)
 
     def _get_padding(self):
         """:return: padding string, e.g. %07d"""
@@ -731,36 +1968,25 @@ class Sequence(list):
 
         :return: formatted frame range string.
         """
-        frange = []
-        start = ''
-        end = ''
         if not missing:
             if frames:
                 return '%s-%s' % (self.start(), self.end())
             else:
                 return ''
-
-        if not frames:
+        return self._get_ranges(FrameSet(frames).ranges())
+
+    def _get_range(self):
+        """:return: implied range string, e.g. 1-500, or '' if no frames."""
+        if self.frameset():
+            return '%s-%s' % (self.start(), self.end())
+        return ''
+
+    def _get_ranges(self, ranges):
+        """:return: explicit range string, e.g. [1-10, 15-20], or '' if
+        ranges is empty."""
+        if not ranges:
             return ''
-
-        for i in range(0, len(frames)):
-            frame = frames[i]
-            if i != 0 and frame != frames[i - 1] + 1:
-                if start != end:
-                    frange.append('%s-%s' % (str(start), str(end)))
-                elif start == end:
-                    frange.append(str(start))
-                start = end = frame
-                continue
-            if start is '' or int(start) > frame:
-                start = frame
-            if end is '' or int(end) < frame:
-                end = frame
-        if start == end:
-            frange.append(str(start))
-        else:
-            frange.append('%s-%s' % (str(start), str(end)))
-        return "[%s]" % range_join.join(frange)
+        return '[%s]' % _format_ranges(ranges)
 
     def _get_frames(self):
         """finds the sequence indexes from item names
@@ -769,18 +1995,271 @@ class Sequence(list):
 
     def _get_missing(self):
         """Looks for missing sequence indexes in sequence
+        """
+        return _expand_ranges(self.frameset().gaps())
+
+
+class VirtualSequence(Sequence):
+    """Sequence defined only by its head, padding, tail and frame numbers.
+
+    Items are created when they are accessed, by iteration or indexing, so
+    huge frame ranges cost as much as their number of contiguous ranges.
+    Length, start, end, format and membership tests do not depend on the
+    number of frames, and the disk is only touched when asked, for example
+    with exists or size. For example:
+
+        >>> seq = uncompress('shot.%08d.exr 1-5000000', fmt='%h%p%t %r',
+        ...                  virtual=True)
+        >>> len(seq)
+        5000000
+        >>> print(seq[-1])
+        shot.05000000.exr
+        >>> 'shot.00001234.exr' in seq
+        True
+
+    A new Item is returned every time one is accessed. Items can be added
+    and removed with append, extend, remove and pop, but not set or inserted
+    at an index.
+
+    :param head: string preceding the sequence number.
+    :param pad: padding string, e.g. %04d.
+    :param tail: string after the sequence number.
+    :param frames: :class:`.FrameSet` or iterable of frame numbers.
+    :param dirname: directory of the items.
+    """
+
+    def __init__(self, head, pad, tail, frames, dirname=''):
+        list.__init__(self)
+        if not isinstance(frames, FrameSet):
+            frames = FrameSet(frames)
+        self.__frameset = frames
+        self.__head = head
+        self.__pad = pad
+        self.__tail = tail
+        self.__dirname = dirname
+        self.__abspath = None
+        self._reset_frames()
+
+    def __len__(self):
+        return len(self.__frameset)
+
+    def __iter__(self):
+        for frame in self.__frameset:
+            yield self._item(frame)
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self._item(self.__frameset[index])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._item(self.__frameset[i])
+                    for i in range(*index.indices(len(self)))]
+        return self._item(self.__frameset[index])
+
+    def __getslice__(self, start, end):
+        return self.__getitem__(slice(start, end))
+
+    def __contains__(self, item):
+        frame = self._match(item)
+        return frame is not None and frame in self.__frameset
 
-        .. todo:: change this to:
-            r = range(frames[0], frames[-1] + 1)
-            return sorted(list(set(frames).symmetric_difference(r)))
+    def __eq__(self, other):
+        if not isinstance(other, list) or len(self) != len(other):
+            return False
+        return all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __delitem__(self, index):
+        self.pop(index)
+
+    def __setitem__(self, index, item):
+        raise SequenceError('Items of a virtual sequence cannot be set')
+
+    def __setslice__(self, start, end, item):
+        raise SequenceError('Items of a virtual sequence cannot be set')
+
+    def __delslice__(self, start, end):
+        raise SequenceError('Items of a virtual sequence cannot be set')
+
+    def insert(self, index, item):
+        raise SequenceError('Items of a virtual sequence cannot be inserted')
+
+    def reIndex(self, offset, padding=None, jobs=None, journal=None):
+        """Virtual sequences do not rename files, see Sequence.reIndex().
+
+        :raises SequenceError: always.
+        """
+        raise SequenceError('Virtual sequences cannot be reindexed')
+
+    def frameset(self):
+        """:return: :class:`.FrameSet` of the frame numbers in sequence."""
+        return self.__frameset
+
+    def find(self, frame):
+        """:return: a new Item of frame, or None if it is not in sequence.
+        """
+        if frame in self.__frameset:
+            return self._item(frame)
+
+    def includes(self, item):
+        """Checks if the item can be contained in this sequence, that is if
+        its name has the head, tail and padding of the sequence.
+        """
+        return len(self) == 0 or self._match(item) is not None
+
+    def contains(self, item):
+        """Checks if the item is a sibling within the start and end frames,
+        see :meth:`Sequence.contains`.
+        """
+        frame = self._match(item)
+        return frame is not None and self.end() >= frame >= self.start()
+
+    def append(self, item):
+        """Adds the frame of item to the sequence.
+
+        :exc:`SequenceError` raised if item is not a sequence member.
+        """
+        frame = self._match(item)
+        if frame is None:
+            raise SequenceError('Item is not a member of this sequence')
+        self.__frameset.add(frame)
+        self._reset_frames()
+
+    def extend(self, items):
+        """Adds the frames of items to the sequence.
+        """
+        for item in items:
+            self.append(item)
+
+    def pop(self, index=-1):
+        """Removes and returns the item at index (default last).
         """
-        missing = []
-        frames = self.frames()
-        if len(frames) == 0:
-            return missing
+        frame = self.__frameset[index]
+        item = self._item(frame)
+        self.__frameset.discard(frame)
+        self._reset_frames()
+        return item
+
+    def remove(self, item):
+        """Removes the frame of item from the sequence.
+        """
+        frame = self._match(item)
+        if frame is None or frame not in self.__frameset:
+            raise ValueError('%s is not in sequence' % item)
+        self.__frameset.discard(frame)
+        self._reset_frames()
+
+    def clear(self):
+        """Removes all the frames.
+        """
+        self.__frameset = FrameSet()
+        self._reset_frames()
+
+    def copy(self):
+        """:return: a new VirtualSequence with the same frames."""
+        return VirtualSequence(self.__head, self.__pad, self.__tail,
+                               FrameSet.from_ranges(self.__frameset.ranges()),
+                               self.__dirname)
+
+    def index(self, item, *args):
+        """Returns the position of item in the sequence, optionally only
+        looking between start and stop, as list.index does.
+
+        :exc:`ValueError` raised if item is not in sequence.
+        """
+        frame = self._match(item)
+        if frame is not None and frame in self.__frameset:
+            index = self.__frameset.index(frame)
+            start = args[0] if args else 0
+            stop = args[1] if len(args) > 1 else len(self)
+            start, stop, _ = slice(start, stop).indices(len(self))
+            if start <= index < stop:
+                return index
+        raise ValueError('%s is not in sequence' % item)
+
+    def count(self, item):
+        """:return: 1 if item is in sequence, otherwise 0."""
+        return int(item in self)
+
+    def sort(self, key=None, reverse=False):
+        """Items are always sorted by frame, so this only accepts the default
+        order.
+
+        :exc:`TypeError` raised for any other order.
+        """
+        if key is not None or reverse:
+            raise TypeError('Virtual sequences are always sorted by frame')
+
+    def reverse(self):
+        raise TypeError('Virtual sequences are always sorted by frame')
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    __rmul__ = __mul__
+
+    def __imul__(self, count):
+        raise TypeError('Virtual sequences cannot repeat items')
+
+    def _append_sibling(self, item):
+        self.__frameset.add(item.frame)
+        self._reset_frames()
+
+    def _layout(self):
+        return self.__head, self.__pad, self.__tail
+
+    def head(self):
+        if not len(self):
+            # e.g. an empty intersection
+            return self.__head
+        return super(VirtualSequence, self).head()
+
+    def tail(self):
+        if not len(self):
+            return self.__tail
+        return super(VirtualSequence, self).tail()
 
-        r = range(frames[0], frames[-1] + 1)
-        return sorted(list(set(frames).symmetric_difference(r)))
+    def _get_frames(self):
+        return list(self.__frameset)
+
+    def _item(self, frame):
+        """Returns a new Item of the given frame.
+        """
+        digits = self.__pad % frame
+        item = Item(os.path.join(
+            self.__dirname, '%s%s%s' % (self.__head, digits, self.__tail)))
+        if len(self) > 1:
+            start = len(self.__head)
+            item._set_frame(digits, start, start + len(digits))
+        return item
+
+    def _match(self, item):
+        """Returns the frame number of item if its name fits the sequence,
+        otherwise None.
+        """
+        if not isinstance(item, Item):
+            item = Item(item)
+        if self.__abspath is None:
+            self.__abspath = os.path.abspath(self.__dirname)
+        name = item.name
+        head = self.__head
+        tail = self.__tail
+        if item.dirname != self.__abspath or \
+                len(name) <= len(head) + len(tail) or \
+                not name.startswith(head) or not name.endswith(tail):
+            return None
+        digits = name[len(head):len(name) - len(tail)]
+        if not digits.isdigit():
+            return None
+        frame = int(digits)
+        if strict_pad is True and self.__pad % frame != digits:
+            return None
+        return frame
 
 
 def diff(f1, f2):
@@ -799,7 +2278,8 @@ def diff(f1, f2):
 
     :return: Dictionary with keys: frames, start, end.
     """
-    log.debug('diff: %s %s' % (f1, f2))
+    if _stats_enabled:
+        stats.count('diff')
     if not type(f1) == Item:
         f1 = Item(f1)
     if not type(f2) == Item:
@@ -822,11 +2302,213 @@ def diff(f1, f2):
                     'frames': (m1.group(), m2.group())
                 })
 
-    log.debug(d)
     return d
 
 
-def uncompress(seq_string, fmt=global_format):
+def _signature(item):
+    """Returns the grouping signature of an Item: a tuple of the
+    non-numerical parts of its name, the digit values and their widths. Two
+    items can only be siblings if their parts are equal.
+    """
+    values = tuple(item.digits)
+    return (tuple(item.parts), values, tuple(map(len, values)))
+
+
+def _digits_start(sig, index):
+    """Returns the position in the name of the digit run at index.
+    """
+    return sum(map(len, sig[0][:index + 1])) + sum(sig[2][:index])
+
+
+def _signature_diff(sig1, sig2):
+    """Pure equivalent of :func:`diff` working on two signatures that share
+    the same parts. Returns the indexes of the digit runs that could be the
+    sequence number.
+    """
+    indexes = []
+    offset1 = offset2 = 0
+    for i, (v1, v2) in enumerate(zip(sig1[1], sig2[1])):
+        # runs are only compared when they start at the same position
+        if offset1 == offset2 and v1 != v2:
+            if not (strict_pad is True and len(v1) != len(v2)):
+                indexes.append(i)
+        offset1 += len(v1)
+        offset2 += len(v2)
+    return indexes
+
+
+def _wildcards(sig):
+    """Returns one key per digit run of a signature, with that run left out,
+    e.g. the keys of 'a1b2' are (widths, 0, ('2',)) and (widths, 1, ('1',)).
+    Two names with the same parts and widths are siblings if they share a
+    key and differ in the digits that were left out.
+    """
+    values = sig[1]
+    widths = sig[2]
+    return [(widths, i, values[:i] + values[i + 1:])
+            for i in range(len(values))]
+
+
+class _Bucket(object):
+    """Indexes the last items of all the sequences whose names share the same
+    non-numerical parts.
+    """
+
+    def __init__(self):
+        # wildcard key -> {digits left out: set(orders)}
+        self.wildcards = {}
+        # widths -> {order: signature}
+        self.widths = {}
+        # path -> set(orders)
+        self.paths = {}
+
+    def register(self, order, item, sig, keys):
+        self.widths.setdefault(sig[2], {})[order] = sig
+        self.paths.setdefault(item.path, set()).add(order)
+        wildcards = self.wildcards
+        for key, value in zip(keys, sig[1]):
+            entries = wildcards.get(key)
+            if entries is None:
+                entries = wildcards[key] = {}
+            orders = entries.get(value)
+            if orders is None:
+                entries[value] = set([order])
+            else:
+                orders.add(order)
+
+    def unregister(self, order, item, sig, keys):
+        orders = self.widths[sig[2]]
+        del orders[order]
+        if not orders:
+            del self.widths[sig[2]]
+        _discard(self.paths, item.path, order)
+        wildcards = self.wildcards
+        for key, value in zip(keys, sig[1]):
+            entries = wildcards[key]
+            _discard(entries, value, order)
+            if not entries:
+                del wildcards[key]
+
+
+def _discard(mapping, key, order):
+    """Removes order from the set stored at mapping[key], dropping the key
+    when the set becomes empty.
+    """
+    orders = mapping[key]
+    orders.discard(order)
+    if not orders:
+        del mapping[key]
+
+
+class _Grouper(object):
+    """Single-pass grouping engine used by :func:`get_sequences`.
+
+    Items are bucketed by the non-numerical parts of their names. Inside a
+    bucket the last item of every sequence is indexed once per digit run,
+    with that run wildcarded, so finding the sequence an item belongs to is
+    a few dict lookups instead of a scan over every sequence found so far.
+    Sequences whose last item has different digit widths (only possible
+    siblings when `strict_pad` is False, or for mismatched runs that diff()
+    skips) are compared with the signature directly.
+
+    The result is the same as comparing each item against every sequence
+    in reverse creation order with :meth:`Sequence.includes`: the most
+    recently created matching sequence wins.
+    """
+
+    def __init__(self):
+        self.seqs = []
+        self._buckets = {}
+        self._lasts = []
+
+    def add(self, item):
+        """Adds an Item to the sequence it belongs to, or starts a new one.
+        """
+        sig = _signature(item)
+        keys = _wildcards(sig)
+        bucket = self._buckets.get(sig[0])
+        if bucket is None:
+            bucket = self._buckets[sig[0]] = _Bucket()
+
+        order, index = self._find(bucket, item, sig, keys)
+        if order is None:
+            seq = Sequence([item])
+            order = len(self.seqs)
+            self.seqs.append(seq)
+            self._lasts.append((sig, keys))
+        else:
+            seq = self.seqs[order]
+            last = seq[-1]
+            last_sig, last_keys = self._lasts[order]
+            bucket.unregister(order, last, last_sig, last_keys)
+            if index is None:
+                seq.append(item)
+            else:
+                # same as last.is_sibling(item), see Item.is_sibling()
+                start = _digits_start(last_sig, index)
+                last._set_frame(last_sig[1][index], start,
+                                start + last_sig[2][index])
+                # the digits differ in width when strict_pad is False
+                item._set_frame(sig[1][index], start, start + sig[2][index])
+                seq._append_sibling(item)
+            self._lasts[order] = (sig, keys)
+        bucket.register(order, seq[-1], sig, keys)
+        return seq
+
+    def _find(self, bucket, item, sig, keys):
+        """Returns the order of the sequence item should be appended to and
+        the index of the digit run that is the sequence number, or None for
+        the index when the sequence has to check membership itself.
+        """
+        best = -1
+        best_index = None
+        values = sig[1]
+        widths = sig[2]
+
+        # last items with the same digit widths: exactly one run differs
+        wildcards = bucket.wildcards
+        for i, key in enumerate(keys):
+            entries = wildcards.get(key)
+            if not entries:
+                continue
+            for value, orders in entries.items():
+                if value != values[i]:
+                    order = max(orders)
+                    if order > best:
+                        best = order
+                        best_index = i
+
+        # last items with different digit widths
+        if len(bucket.widths) > 1 or widths not in bucket.widths:
+            for other, orders in bucket.widths.items():
+                if other == widths:
+                    continue
+                for order, last in orders.items():
+                    if order > best:
+                        indexes = _signature_diff(last, sig)
+                        if len(indexes) == 1:
+                            best = order
+                            best_index = indexes[0]
+
+        # same path as the last item, see Sequence.includes()
+        paths = bucket.paths.get(item.path)
+        if paths:
+            for order in sorted(paths, reverse=True):
+                if order <= best:
+                    break
+                first = self.seqs[order][0]
+                if first == item or \
+                        len(_signature_diff(_signature(first), sig)) == 1:
+                    best = order
+                    best_index = None
+                    break
+
+        if best < 0:
+            return None, None
+        return best, best_index
+
+
+def uncompress(seq_string, fmt=global_format, virtual=False):
     """Basic uncompression or deserialization of a compressed sequence string.
 
     For example: ::
@@ -847,141 +2529,176 @@ def uncompress(seq_string, fmt=global_format):
         >>> len(seq3)
         7
 
+    Huge frame ranges can be uncompressed to a :class:`.VirtualSequence`,
+    which creates its items on demand: ::
+
+        >>> seq4 = uncompress('a.%08d.exr 1-5000000', fmt='%h%p%t %r',
+        ...                   virtual=True)
+        >>> len(seq4)
+        5000000
+
     See unit tests for more examples.
 
     :param seq_string: Compressed sequence string.
     :param fmt: Format of sequence string.
+    :param virtual: return a :class:`.VirtualSequence`.
 
     :return: :class:`.Sequence` instance.
     """
     dirname = os.path.dirname(seq_string)
-    # remove directory
-    if "%D" in fmt:
-        fmt = fmt.replace("%D", "")
     name = os.path.basename(seq_string)
     log.debug('uncompress: %s' % name)
 
-    # map of directives to regex
-    remap = {
-        's': '\d+',
-        'e': '\d+',
-        'l': '\d+',
-        'h': '(\S+)?',
-        't': '(\S+)?',
-        'r': '\d+-\d+',
-        'R': '\[[\d\s?\-%s?]+\]' % re.escape(range_join),
-        'p': '%\d+d',
-        'm': '\[.*\]',
-        'f': '\[.*\]',
-    }
-
-    log.debug('fmt in: %s' % fmt)
+    match = _compile_uncompress(fmt).match(name)
+    if not match:
+        log.debug('No matches.')
+        return
+    groups = match.groupdict()
+    log.debug("match: %s" % groups)
+
+    pad = groups.get('p') or '%d'
+    start = groups.get('s')
+    end = groups.get('e')
+    if groups.get('r'):
+        start, end = groups['r'].split('-')
+
+    # %R, then %r or %s and %e, are overridden by %f, then by %m
+    if groups.get('R') is not None:
+        ranges, pad_len = _parse_ranges(groups['R'][1:-1])
+        if pad == '%d' and pad_len != 0:
+            pad = '%0' + str(pad_len) + 'd'
+        frames = FrameSet.from_ranges(ranges)
+    elif start is not None and end is not None:
+        frames = FrameSet.from_ranges([(int(start), int(end))])
+    else:
+        frames = FrameSet()
+    if groups.get('f') is not None:
+        frames = FrameSet(_parse_frame_list(groups['f']))
+    if groups.get('m') is not None and start is not None and \
+            end is not None:
+        missing = set(_parse_frame_list(groups['m']))
+        if missing:
+            frames = FrameSet(i for i in range(int(start), int(end) + 1)
+                              if i not in missing)
+
+    if strict_pad is True and frames:
+        # frames that do not fit the padding are not siblings, keep the
+        # ones of the first name like get_sequences() would
+        widths = _split_widths(frames.ranges(), len(pad % 0))
+        width = min(widths, key=lambda w: pad % widths[w][0][0])
+        frames = FrameSet.from_ranges(widths[width])
+    if not frames:
+        return []
+
+    head = groups.get('h') or ''
+    tail = groups.get('t') or ''
+    if virtual:
+        return VirtualSequence(head, pad, tail, frames, dirname)
 
-    # escape any re chars in format
-    fmt = re.escape(fmt)
+    seq = None
+    for frame in (pad % x for x in frames):
+        path = os.path.join(dirname, '%s%s%s' % (head, frame, tail))
+        if seq is None:
+            seq = Sequence([path])
+            item = seq[0]
+        else:
+            item = Item(path)
+            seq._append_sibling(item)
+        if len(frames) > 1:
+            item._set_frame(frame, len(head), len(head) + len(frame))
+    seq._reset_frames()
+    return seq
+
+
+# directive -> regex of the values uncompress() can parse
+uncompress_patterns = {
+    's': r'\d+',
+    'e': r'\d+',
+    'l': r'\d+',
+    'h': r'(\S+)?',
+    't': r'(\S+)?',
+    'r': r'\d+-\d+',
+    'R': r'\[[\d\s?\-%s?]+\]' % re.escape(range_join),
+    'p': r'%\d+d',
+    'm': r'\[.*\]',
+    'f': r'\[.*\]',
+}
+
+# compiled uncompress() regexes, see _compile_uncompress()
+_uncompress_formats = {}
+
+
+def _compile_uncompress(fmt):
+    """Returns the regex matching sequence strings of a format, cached.
+    """
+    regex = _uncompress_formats.get(fmt)
+    if regex is not None:
+        return regex
 
-    # replace \% with % back again
-    fmt = fmt.replace('\\%', '%')
+    # the directory is split off before matching
+    pattern = fmt.replace("%D", "")
+    log.debug('fmt in: %s' % pattern)
 
-    log.debug('fmt escaped: %s' % fmt)
+    # escape any re chars in format, then replace \% with % back again
+    pattern = re.escape(pattern).replace('\\%', '%')
+    log.debug('fmt escaped: %s' % pattern)
 
-    for m in format_re.finditer(fmt):
+    for m in format_re.finditer(pattern):
         _old = '%%%s%s' % (m.group('pad') or '', m.group('var'))
         _new = '(?P<%s>%s)' % (
             m.group('var'),
-            remap.get(m.group('var'), '\w+')
+            uncompress_patterns.get(m.group('var'), r'\w+')
         )
-        fmt = fmt.replace(_old, _new)
-
-    log.debug('fmt: %s' % fmt)
-
-    regex = re.compile(fmt)
-    match = regex.match(name)
-
-    log.debug("match: %s" % match.groupdict() if match else "")
-
-    frames = []
-    missing = []
-    s = None
-    e = None
-
-    if not match:
-        log.debug('No matches.')
-        return
-
-    try:
-        pad = match.group('p')
-
-    except IndexError:
-        pad = "%d"
+        pattern = pattern.replace(_old, _new)
+    log.debug('fmt: %s' % pattern)
 
-    try:
-        R = match.group('R')
-        R = R[1:-1]
-        number_groups = R.split(range_join)
-        pad_len = 0
-        for number_group in number_groups:
-            if '-' in number_group:
-                splits = number_group.split('-')
-                pad_len = max(pad_len, len(splits[0]), len(splits[1]))
-                start = int(splits[0])
-                end = int(splits[1])
-                frames.extend(range(start, end + 1))
-
-            else:
-                end = int(number_group)
-                pad_len = max(pad_len, len(number_group))
-                frames.append(end)
-        if pad == "%d" and pad_len != 0:
-            pad = "%0" + str(pad_len) + "d"
-
-    except IndexError:
-        try:
-            r = match.group('r')
-            s, e = r.split('-')
-            frames = range(int(s), int(e) + 1)
-
-        except IndexError:
-            s = match.group('s')
-            e = match.group('e')
+    if len(_uncompress_formats) > 256:
+        _uncompress_formats.clear()
+    regex = _uncompress_formats[fmt] = re.compile(pattern)
+    return regex
 
-    try:
-        frames = eval(match.group('f'))
-
-    except IndexError:
-        pass
-
-    try:
-        missing = eval(match.group('m'))
 
-    except IndexError:
-        pass
+def _split_widths(ranges, pad_len):
+    """Splits frame ranges by the number of digits of their frames padded
+    to pad_len.
 
-    items = []
-    if missing:
-        for i in range(int(s), int(e) + 1):
-            if i in missing:
-                continue
-            f = pad % i
-            name = '%s%s%s' % (
-                match.groupdict().get('h', ''), f, 
-                match.groupdict().get('t', '')
-            )
-            items.append(Item(os.path.join(dirname, name)))
+    :return: dict of width -> list of (start, end) inclusive ranges.
+    """
+    widths = {}
+    for start, end in ranges:
+        while start <= end:
+            width = max(pad_len, len(str(start)))
+            last = min(end, 10 ** width - 1)
+            widths.setdefault(width, []).append((start, last))
+            start = last + 1
+    return widths
+
+
+def _parse_ranges(text):
+    """Parses a frame range string like '1-3, 10, 12-14' joined on
+    $PYSEQ_RANGE_SEP.
+
+    :return: list of (start, end) inclusive ranges and the length of the
+             longest number.
+    """
+    ranges = []
+    pad_len = 0
+    for number_group in text.split(range_join):
+        if '-' in number_group:
+            first, last = number_group.split('-')
+            pad_len = max(pad_len, len(first), len(last))
+            ranges.append((int(first), int(last)))
+        else:
+            pad_len = max(pad_len, len(number_group))
+            ranges.append((int(number_group), int(number_group)))
+    return ranges, pad_len
 
-    else:
-        for i in frames:
-            f = pad % i
-            name = '%s%s%s' % (
-                match.groupdict().get('h', ''), f, 
-                match.groupdict().get('t', '')
-            )
-            items.append(Item(os.path.join(dirname, name)))
 
-    seqs = get_sequences(items)
-    if seqs:
-        return seqs[0]
-    return seqs
+def _parse_frame_list(text):
+    """Parses a list of frame numbers like '[1, 2, 5]', as formatted by the
+    %f and %m directives.
+    """
+    return [int(x) for x in re.findall(r'-?\d+', text)]
 
 
 @deprecated
@@ -991,7 +2708,7 @@ def getSequences(source):
     return get_sequences(source)
 
 
-def get_sequences(source):
+def get_sequences(source, workers=None):
     """Returns a list of Sequence objects given a directory or list that contain
     sequential members.
 
@@ -1032,48 +2749,151 @@ def get_sequences(source):
         >>> seqs[0].date
         datetime.datetime(2011, 3, 21, 17, 31, 24)
 
-    :param source: Can be directory path, list of strings, or sortable list of objects.
+    Get sequences from os.DirEntry objects, reusing their cached stat
+    results:
+
+        >>> seqs = get_sequences(list(os.scandir('./tests/files/')))
+
+    Group a very large list on 8 processes, the result is the same:
+
+        >>> seqs = get_sequences(paths, workers=8)
+
+    :param source: Can be directory path, list of strings, list of
+                   os.DirEntry objects or sortable list of objects.
+    :param workers: number of processes to group the items on. Items are
+                    sharded by the non-numerical parts of their names, so
+                    no sequence spans two shards.
 
     :return: List of pyseq.Sequence class objects.
     """
-    start = datetime.now()
-
-    # list for storing sequences to be returned later
-    seqs = []
+    timing = _stats_enabled
+    if timing:
+        start = time.time()
 
     if isinstance(source, list):
-        items = sorted(source, key=lambda x: str(x))
+        items = source
 
     elif isinstance(source, basestring):
         if os.path.isdir(source):
-            items = sorted(glob(os.path.join(source, '*')))
+            items = listdir(source)
         else:
-            items = sorted(glob(source))
+            items = glob(source)
+        if timing:
+            start = stats.lap('list', start)
 
     else:
         raise TypeError('Unsupported format for source argument')
 
-    log.debug('Found %s files' % len(items))
+    items = sorted(items, key=_str_key)
+    log.debug('Found %s files', len(items))
+    if timing:
+        start = stats.lap('sort', start)
 
-    # organize the items into sequences
-    while items:
-        item = Item(items.pop(0))
-        found = False
-        for seq in seqs[::-1]:
-            if seq.includes(item):
-                seq.append(item)
-                found = True
-                break
-        if not found:
-            seq = Sequence([item])
-            seqs.append(seq)
+    if workers is not None and workers > 1:
+        seqs = _group_sharded(items, workers)
+    else:
+        # organize the items into sequences
+        grouper = _Grouper()
+        for item in items:
+            grouper.add(Item(item))
+        seqs = grouper.seqs
+
+    if timing:
+        stats.lap('group', start)
+
+    return seqs
+
+
+# number of shards per worker process of get_sequences, more shards than
+# processes balances the load when some shards are much larger
+shards_per_worker = 4
+
+
+def _group_shard(args):
+    """Groups one shard of get_sequences(..., workers=N) in a worker
+    process. Returns each sequence in a compact form instead of Items: an
+    array of the index of each name in the shard followed by the start and
+    end of its frame number in the name, -1 when it has none.
+    """
+    global strict_pad
+    names, strict_pad = args
+    indexes = {}
+    grouper = _Grouper()
+    for index, name in enumerate(names):
+        item = Item(name)
+        indexes.setdefault(item.path, []).append(index)
+        grouper.add(item)
+    result = []
+    for seq in grouper.seqs:
+        packed = array('l')
+        for item in seq:
+            packed.append(indexes[item.path].pop(0))
+            if item.frame is None:
+                packed.extend((-1, -1))
+            else:
+                start = len(item.head)
+                packed.extend((start, len(item.name) - len(item.tail)))
+        result.append(packed)
+    return result
 
-    log.debug('time: %s' % (datetime.now() - start))
 
-    return list(seqs)
+def _group_sharded(items, workers):
+    """Groups sorted items on a pool of worker processes, see
+    get_sequences(). Items only go to the workers as names, and are rebuilt
+    from the original source objects, in the order a single process would
+    have created their sequences.
+    """
+    count = workers * shards_per_worker
+    shards = [[] for _ in range(count)]
+    names = [_str_key(item) for item in items]
+    strip = digits_re.sub
+    for index, name in enumerate(names):
+        shard = hash(strip('', name[name.rfind(os.sep) + 1:])) % count
+        shards[shard].append(index)
+    shards = [x for x in shards if x]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        results = pool.map(_group_shard, [
+            ([names[i] for i in shard], strict_pad) for shard in shards
+        ])
+    finally:
+        pool.close()
+        pool.join()
+
+    # sequences are created in the order of their first item
+    groups = []
+    for shard, result in zip(shards, results):
+        for packed in result:
+            groups.append((shard[packed[0]], shard, packed))
+    groups.sort(key=lambda x: x[0])
+
+    seqs = []
+    for first, shard, packed in groups:
+        seq = None
+        for pos in range(0, len(packed), 3):
+            index = shard[packed[pos]]
+            if seq is None:
+                seq = Sequence([items[index]])
+                item = seq[0]
+            else:
+                item = Item(items[index])
+                seq._append_sibling(item)
+            start, end = packed[pos + 1], packed[pos + 2]
+            if start >= 0:
+                # same as item._set_frame(), without resolving the path
+                name = names[index]
+                name = name[name.rfind(os.sep) + 1:]
+                item.frame = int(name[start:end])
+                item.pad = end - start
+                item.head = name[:start]
+                item.tail = name[end:]
+        seq._reset_frames()
+        seqs.append(seq)
+    return seqs
 
 
-def iget_sequences(source):
+def iget_sequences(source, chunk_size=None):
     """ Generator version of get_sequences.  Creates Sequences from a various
     source files.  A notable difference is the sort order of iget_sequences
     versus get_sequences.  iget_sequences uses an adaption of natural sorting
@@ -1116,29 +2936,49 @@ def iget_sequences(source):
         fileA.1-2.rgb
         fileB.1.rgb
 
+    Get sequences from a listing too large to sort in memory, keeping at
+    most chunk_size names in memory at a time:
+
+        >>> with open('find.txt') as names:
+        ...     for s in iget_sequences(names, chunk_size=1000000):
+        ...         print(s)
 
     :param source: Can be directory path, list of strings, or sortable list of objects.
+    :param chunk_size: sort the names in chunks of chunk_size, spilled to
+                       temporary files and merged, instead of all at once.
+                       source can then also be any iterable of names, e.g.
+                       an open file with one path per line.
 
     :return: List of pyseq.Sequence class objects.
     """
-    start = datetime.now()
+    timing = _stats_enabled
+    if timing:
+        start = time.time()
     if isinstance(source, list):
         items = source
     elif isinstance(source, str):
         if os.path.isdir(source):
-            join = os.path.join
-            items = [join(source, x) for x in os.listdir(source)]
+            items = listdir(source, hidden=True)
         else:
-            items = iglob(source)
+            items = list(iglob(source))
+        if timing:
+            start = stats.lap('list', start)
+    elif chunk_size and hasattr(source, '__iter__'):
+        items = source
     else:
         raise TypeError("Unsupported format for source argument")
 
-    items = sorted(items, key=_ext_key)
-    log.debug("Found %d files", len(items))
+    if chunk_size:
+        items = _external_sort(items, chunk_size)
+    else:
+        items = sorted(items, key=lambda x: _ext_key(_str_key(x)))
+        log.debug("Found %d files", len(items))
+        if timing:
+            stats.lap('sort', start)
 
     seq = None
-    while items:
-        item = Item(items.pop(0))
+    for item in items:
+        item = Item(item)
         if seq is None:
             seq = Sequence([item])
         elif seq.includes(item):
@@ -1149,10 +2989,837 @@ def iget_sequences(source):
 
     if seq is not None:
         yield seq
-    log.debug("time: %s", datetime.now() - start)
 
 
-def walk(source, level=-1, topdown=True, onerror=None, followlinks=False, hidden=False):
+# number of names written to the temporary files of _external_sort at once
+spill_batch_size = 1024
+
+
+def _spill(chunk):
+    """Sorts a list of (key, index, name) tuples and writes it to a
+    temporary file, in pickled batches.
+
+    :return: the file, rewound.
+    """
+    chunk.sort()
+    spill = tempfile.TemporaryFile()
+    for index in range(0, len(chunk), spill_batch_size):
+        pickle.dump(chunk[index:index + spill_batch_size], spill, 2)
+    spill.seek(0)
+    return spill
+
+
+def _unspill(spill):
+    """Yields the (key, index, name) tuples written to a file by _spill().
+    """
+    while True:
+        try:
+            batch = pickle.load(spill)
+        except EOFError:
+            return
+        for record in batch:
+            yield record
+
+
+def _external_sort(items, chunk_size):
+    """Yields items in iget_sequences() order, sorting them in chunks of
+    chunk_size that are spilled to temporary files and merged, so memory
+    use does not depend on the number of names. The sort key and position
+    of each item are stored with it, so items with the same key keep their
+    input order, as in the in-memory sort. Strings lose the trailing
+    newline of lines read from a file. Other items, e.g. os.DirEntry or
+    Item objects, cannot always be pickled, so they are kept in memory as
+    they are and only their keys are spilled.
+    """
+    spills = []
+    chunk = []
+    objects = {}
+    try:
+        for index, item in enumerate(items):
+            if isinstance(item, basestring) and not isinstance(item, Item):
+                if item.endswith('\n'):
+                    item = item.rstrip('\r\n')
+                chunk.append((_ext_key(item), index, item))
+            else:
+                objects[index] = item
+                chunk.append((_ext_key(_str_key(item)), index, None))
+            if len(chunk) >= chunk_size:
+                spills.append(_spill(chunk))
+                chunk = []
+        if spills:
+            if chunk:
+                spills.append(_spill(chunk))
+                chunk = []
+            log.debug('merging %d sorted chunks', len(spills))
+            records = heapq.merge(*[_unspill(x) for x in spills])
+        else:
+            chunk.sort()
+            records = chunk
+        for key, index, name in records:
+            yield objects.pop(index) if name is None else name
+    finally:
+        for spill in spills:
+            spill.close()
+
+
+class SequenceIndex(object):
+    """Keeps the sequences of a directory or list of names up to date as
+    files are added, removed and renamed, without grouping everything
+    again.
+
+    Each sequence is indexed by the parts of its names other than the
+    sequence number, so finding the sequence of a file is a few dict
+    lookups, and its items are kept in frame order so they are inserted and
+    removed with a binary search. For example:
+
+        >>> index = SequenceIndex(['a.0001.exr', 'a.0002.exr'])
+        >>> seq = index.add('a.0004.exr')
+        >>> print(seq.format('%h%p%t %R'))
+        a.%04d.exr [1-2, 4]
+        >>> seq = index.remove('a.0001.exr')
+        >>> print(seq)
+        a.2-4.exr
+
+    A file is added to the largest sequence it can be a member of, or makes
+    a new sequence with a single file it is a sibling of. When a sequence is
+    down to one file that file is grouped again on its own. For names that
+    can be grouped on several digits the result may differ from
+    get_sequences(), which depends on the sort order of all the names.
+
+    :param source: directory path or list of names, like get_sequences().
+    """
+
+    def __init__(self, source=None):
+        # path -> (item, key of its sequence or None if it is alone)
+        self._items = {}
+        # key -> Sequence of two or more items
+        self._groups = {}
+        # path -> Sequence of a single item
+        self._singles = {}
+        # key -> set of paths of single items that could be grouped on it
+        self._pending = {}
+
+        if source is None:
+            return
+        if isinstance(source, basestring):
+            source = listdir(source)
+        elif not isinstance(source, list):
+            raise TypeError('Unsupported format for source argument')
+        for item in sorted(source, key=_str_key):
+            self.add(item)
+
+    def __len__(self):
+        return len(self._groups) + len(self._singles)
+
+    def __iter__(self):
+        return iter(self.sequences())
+
+    def __contains__(self, path):
+        return Item(path).path in self._items
+
+    def sequences(self):
+        """:return: list of all the sequences, sorted by path like the
+        result of get_sequences()."""
+        seqs = list(self._groups.values()) + list(self._singles.values())
+        return sorted(seqs, key=lambda x: x[0].path)
+
+    def find(self, path):
+        """:return: the Sequence containing path, or None."""
+        entry = self._items.get(Item(path).path)
+        if entry is None:
+            return None
+        item, key = entry
+        if key is None:
+            return self._singles[item.path]
+        return self._groups[key]
+
+    @staticmethod
+    def _keys(sig):
+        """Returns one key per digit run of a signature, leaving that run
+        out: names sharing a key are siblings if their left out runs differ.
+        """
+        parts, values, widths = sig
+        keys = []
+        for i in range(len(values)):
+            if strict_pad is True:
+                key_widths = widths
+            else:
+                key_widths = widths[:i] + widths[i + 1:]
+            keys.append(
+                (parts, i, values[:i] + values[i + 1:], key_widths)
+            )
+        return keys
+
+    @staticmethod
+    def _set_frame(item, sig, index):
+        start = _digits_start(sig, index)
+        item._set_frame(sig[1][index], start, start + sig[2][index])
+
+    def add(self, path):
+        """Adds a file to the sequence it belongs to, or makes a new one.
+
+        :param path: file path, os.DirEntry or pyseq.Item.
+
+        :return: the Sequence path was added to.
+        """
+        item = Item(path)
+        if item.path in self._items:
+            return self.find(item.path)
+        sig = _signature(item)
+        keys = self._keys(sig)
+
+        # the largest existing sequence, the last digit run on ties
+        best = None
+        for index, key in enumerate(keys):
+            seq = self._groups.get(key)
+            if seq is not None and (best is None or len(seq) >= len(best[2])):
+                best = (index, key, seq)
+        if best is not None:
+            index, key, seq = best
+            self._set_frame(item, sig, index)
+            seq._insert_sibling(item)
+            self._items[item.path] = (item, key)
+            return seq
+
+        # a single item it is a sibling of, the last digit run first
+        for index in reversed(range(len(keys))):
+            paths = self._pending.get(keys[index])
+            if paths:
+                other = self._discard_single(min(paths))
+                seq = Sequence([other])
+                other = seq[0]
+                self._set_frame(other, _signature(other), index)
+                self._set_frame(item, sig, index)
+                seq._insert_sibling(item)
+                self._items[other.path] = (other, keys[index])
+                self._items[item.path] = (item, keys[index])
+                self._groups[keys[index]] = seq
+                return seq
+
+        seq = Sequence([item])
+        self._items[item.path] = (seq[0], None)
+        self._singles[item.path] = seq
+        for key in keys:
+            self._pending.setdefault(key, set()).add(item.path)
+        return seq
+
+    def remove(self, path):
+        """Removes a file from its sequence.
+
+        :param path: file path, os.DirEntry or pyseq.Item.
+
+        :return: the Sequence path was removed from.
+
+        :exc:`ValueError` raised if path is not in the index.
+        """
+        path = Item(path).path
+        if path not in self._items:
+            raise ValueError('%s is not in the index' % path)
+        item, key = self._items[path]
+        if key is None:
+            seq = self._singles[path]
+            self._discard_single(path)
+            return seq
+
+        seq = self._groups[key]
+        index = bisect.bisect_left(seq, item)
+        while seq[index].path != path:
+            index += 1
+        seq._remove_sibling(index)
+        del self._items[path]
+
+        if len(seq) == 1:
+            # the last item is grouped again on its own
+            del self._groups[key]
+            last = seq[0]
+            del self._items[last.path]
+            last._clear_frame()
+            seq._reset_frames()
+            self.add(last)
+        return seq
+
+    def rename(self, old, new):
+        """Moves a file from its sequence to the sequence of its new name.
+
+        :return: the Sequence new was added to.
+        """
+        self.remove(old)
+        return self.add(new)
+
+    def _discard_single(self, path):
+        """Removes a single item from the index and returns it.
+        """
+        item = self._items.pop(path)[0]
+        del self._singles[path]
+        for key in self._keys(_signature(item)):
+            _discard(self._pending, key, path)
+        return item
+
+
+def listdir(path, hidden=False):
+    """Lists a directory, returning os.DirEntry objects when scandir is
+    available and paths otherwise. Names starting with a dot are skipped
+    unless hidden is True, like glob does.
+    """
+    if _stats_enabled:
+        stats.count('dirs')
+    if scandir is None:
+        names = os.listdir(path)
+        return [os.path.join(path, x) for x in names
+                if hidden or not x.startswith('.')]
+    return [x for x in scandir(path) if hidden or not x.name.startswith('.')]
+
+
+class _PathEntry(object):
+    """Minimal stand-in for os.DirEntry when scandir is not available.
+    """
+
+    def __init__(self, root, name):
+        self.name = name
+        self.path = os.path.join(root, name)
+
+    def __str__(self):
+        return self.path
+
+
+def _scan_dir(path):
+    """Lists a directory for walking, returning a list of subdirectory names,
+    a list of file entries (os.DirEntry objects, or _PathEntry objects when
+    scandir is not available) and the set of subdirectory names that are
+    symlinks. Raises OSError if the directory cannot be listed.
+    """
+    dirs = []
+    files = []
+    links = set()
+    timing = _stats_enabled
+    if timing:
+        stats.count('dirs')
+        start = time.time()
+
+    if scandir is None:
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if os.path.isdir(full):
+                dirs.append(name)
+                if os.path.islink(full):
+                    links.add(name)
+            else:
+                files.append(_PathEntry(path, name))
+    else:
+        for entry in scandir(path):
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirs.append(entry.name)
+                if entry.is_symlink():
+                    links.add(entry.name)
+            else:
+                files.append(entry)
+    if timing:
+        stats.lap('list', start)
+    return dirs, files, links
+
+
+class ScanCache(object):
+    """Persistent cache of the sequences found in each directory by walk(),
+    stored in a sqlite database so it can be shared by several processes.
+
+    An entry is only used while the directory's st_mtime and st_ino are
+    unchanged, so directories that did not change are not listed or grouped
+    again. Once more than max_entries directories are stored, the least
+    recently used ones are evicted.
+
+        >>> cache = ScanCache('/var/tmp/pyseq')
+        >>> for root, dirs, seqs in walk('/shows/abc', cache=cache):
+        ...     print(root, seqs)
+
+    walk(cache=True) uses a cache in $PYSEQ_CACHE_DIR when it is set.
+
+    :param cache_dir: directory of the cache file, defaults to
+                      $PYSEQ_CACHE_DIR.
+    :param max_entries: maximum number of directories to keep, defaults to
+                        $PYSEQ_CACHE_SIZE or 100000.
+    """
+
+    # directories modified less than this many seconds before they are
+    # listed are not stored, as a later change may not update their mtime
+    racy_window = 2.0
+
+    # number of changes written to the database in one transaction
+    batch_size = 100
+
+    def __init__(self, cache_dir=None, max_entries=None):
+        if sqlite3 is None:
+            raise ImportError('ScanCache requires the sqlite3 module')
+        if cache_dir is None:
+            cache_dir = os.environ['PYSEQ_CACHE_DIR']
+        if max_entries is None:
+            max_entries = int(os.environ.get('PYSEQ_CACHE_SIZE', 100000))
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # names are bytes in python 2 and text in python 3
+        self.path = os.path.join(cache_dir,
+                                 'pyseq-py%d.db' % sys.version_info[0])
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__puts = []
+        self.__hits = []
+        self.__db = sqlite3.connect(self.path, timeout=60,
+                                    check_same_thread=False)
+        with self.__db:
+            self.__db.execute(
+                'CREATE TABLE IF NOT EXISTS dirs (key BLOB PRIMARY KEY, '
+                'mtime REAL, ino TEXT, atime REAL, data BLOB)'
+            )
+            self.__db.execute(
+                'CREATE INDEX IF NOT EXISTS dirs_atime ON dirs (atime)'
+            )
+
+    def __len__(self):
+        self.flush()
+        with self.__lock:
+            return self.__db.execute('SELECT COUNT(*) FROM dirs').fetchone()[0]
+
+    @staticmethod
+    def _key(path, hidden):
+        """Returns the database key of a directory listing, which also
+        depends on the options used to group it.
+        """
+        if not isinstance(path, bytes):
+            try:
+                path = os.fsencode(path)
+            except AttributeError:
+                path = path.encode('utf-8')
+        flags = '%d%d' % (bool(hidden), strict_pad is True)
+        return sqlite3.Binary(flags.encode('ascii') + path)
+
+    def get(self, path, stat, hidden=False):
+        """Returns the cached (dirs, links, seqs) of a directory, or None if
+        it is not cached or has changed since.
+
+        :param path: absolute directory path.
+        :param stat: os.stat result of the directory.
+        :param hidden: whether hidden files and dirs were included.
+        """
+        key = self._key(path, hidden)
+        with self.__lock:
+            try:
+                row = self.__db.execute(
+                    'SELECT mtime, ino, data FROM dirs WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.Error as err:
+                log.debug('cache: %s' % err)
+                return None
+            if row is None or row[0] != stat.st_mtime or \
+                    row[1] != str(stat.st_ino):
+                return None
+            self.__hits.append((time.time(), key))
+        try:
+            dirs, links, seqs = json.loads(bytes(row[2]).decode('ascii'))
+            if isinstance(path, bytes):
+                # python 2 str paths list str names
+                dirs = [d.encode('utf-8') for d in dirs]
+                links = [d.encode('utf-8') for d in links]
+                seqs = [[(n.encode('utf-8'), s, e) for n, s, e in x]
+                        for x in seqs]
+            return dirs, set(links), [_load_sequence(path, x) for x in seqs]
+        except Exception as err:
+            # e.g. a corrupt row, or one from an older version
+            log.debug('cache: %s' % err)
+            return None
+
+    def put(self, path, stat, dirs, links, seqs, hidden=False):
+        """Stores the listing of a directory, unless it was modified too
+        recently to be trusted. Changes are written in batches, see flush().
+
+        :param path: absolute directory path.
+        :param stat: os.stat result of the directory, taken before it was
+                     listed.
+        """
+        now = time.time()
+        if stat.st_mtime > now - self.racy_window:
+            return
+        try:
+            data = json.dumps(
+                [list(dirs), list(links), [_dump_sequence(x) for x in seqs]],
+                separators=(',', ':')
+            ).encode('ascii')
+        except (TypeError, ValueError) as err:
+            # e.g. names that are not UTF-8 in python 2
+            log.debug('cache: %s' % err)
+            return
+        with self.__lock:
+            self.__puts.append((self._key(path, hidden), stat.st_mtime,
+                                str(stat.st_ino), now, sqlite3.Binary(data)))
+            pending = len(self.__puts) + len(self.__hits)
+        if pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the pending changes and evicts the least recently used
+        directories.
+        """
+        with self.__lock:
+            puts, self.__puts = self.__puts, []
+            hits, self.__hits = self.__hits, []
+            if not puts and not hits:
+                return
+            try:
+                with self.__db:
+                    self.__db.executemany(
+                        'INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)',
+                        puts
+                    )
+                    self.__db.executemany(
+                        'UPDATE dirs SET atime = ? WHERE key = ?', hits
+                    )
+                    count = self.__db.execute(
+                        'SELECT COUNT(*) FROM dirs').fetchone()[0]
+                    if count > self.max_entries:
+                        self.__db.execute(
+                            'DELETE FROM dirs WHERE key IN (SELECT key FROM '
+                            'dirs ORDER BY atime LIMIT ?)',
+                            (count - self.max_entries,)
+                        )
+            except sqlite3.Error as err:
+                log.warning('cache: %s' % err)
+
+    def clear(self):
+        """Removes all the cached directories.
+        """
+        with self.__lock:
+            del self.__puts[:]
+            del self.__hits[:]
+            with self.__db:
+                self.__db.execute('DELETE FROM dirs')
+
+    def close(self):
+        """Writes the pending changes and closes the database.
+        """
+        self.flush()
+        self.__db.close()
+
+
+def _dump_sequence(seq):
+    """Returns the names of the items of a sequence and the position of
+    their frame numbers, as stored by ScanCache.
+    """
+    names = []
+    for item in seq:
+        if item.frame is None:
+            names.append((item.name, None, None))
+        else:
+            start = len(item.head)
+            names.append((item.name, start, len(item.name) - len(item.tail)))
+    return names
+
+
+def _load_sequence(dirname, names):
+    """Rebuilds a sequence stored by ScanCache without grouping its items
+    again.
+    """
+    seq = None
+    for name, start, end in names:
+        path = os.path.join(dirname, name)
+        if seq is None:
+            seq = Sequence([path])
+            item = seq[0]
+        else:
+            item = Item(path)
+            seq._append_sibling(item)
+        if start is not None:
+            item._set_frame(name[start:end], start, end)
+    seq._reset_frames()
+    return seq
+
+
+def _default_cache():
+    """Returns a ScanCache in $PYSEQ_CACHE_DIR, or None if it is not set.
+    """
+    if sqlite3 is None or not os.environ.get('PYSEQ_CACHE_DIR'):
+        return None
+    try:
+        return ScanCache()
+    except (OSError, sqlite3.Error) as err:
+        log.warning('cache: %s' % err)
+        return None
+
+
+def _scan(path, hidden=False, cache=None):
+    """Lists a directory and groups its files into sequences, returning a
+    list of subdirectory names, the set of those that are symlinks and the
+    list of sequences. Hidden files and dirs are skipped unless hidden is
+    True. Unchanged directories are read from cache, if given.
+    """
+    if cache is not None:
+        stat = os.stat(path)
+        result = cache.get(path, stat, hidden)
+        if _stats_enabled:
+            stats.count('cache_misses' if result is None else 'cache_hits')
+        if result is not None:
+            return result
+
+    dirs, files, links = _scan_dir(path)
+    if not hidden:
+        files = [f for f in files if not f.name[0] == '.']
+        dirs = [d for d in dirs if not d[0] == '.']
+    seqs = get_sequences(files)
+
+    if cache is not None:
+        cache.put(path, stat, dirs, links, seqs, hidden)
+    return dirs, links, seqs
+
+
+def _walk(top, topdown=True, onerror=None, followlinks=False, hidden=False,
+          cache=None):
+    """Same as os.walk, but yields the sequences found in each directory
+    instead of its files.
+    """
+    try:
+        dirs, links, seqs = _scan(top, hidden, cache)
+    except OSError as err:
+        if onerror is not None:
+            onerror(err)
+        return
+
+    if topdown:
+        yield top, dirs, seqs
+
+    for name in dirs:
+        if not followlinks and name in links:
+            continue
+        for x in _walk(os.path.join(top, name), topdown, onerror,
+                       followlinks, hidden, cache):
+            yield x
+
+    if not topdown:
+        yield top, dirs, seqs
+
+
+# number of directories each walk job lists ahead of the caller
+walk_read_ahead = 2
+
+
+class _ParallelWalker(object):
+    """Walks a directory tree like walk(), but lists the directories and
+    groups their sequences on a pool of worker threads, so that slow
+    (e.g. network) filesystems are read concurrently.
+
+    At most jobs * walk_read_ahead directories are listed ahead of the
+    caller, queued or waiting to be yielded, so memory does not grow with
+    the size of the tree. When ordered is True the results are yielded in
+    the same order as the serial walk and the directories the caller needs
+    next are listed first, otherwise they are yielded in the order the
+    listings complete. Bottom-up walks always yield a directory after all
+    of its subdirectories.
+    """
+
+    def __init__(self, top, jobs, level=-1, topdown=True, onerror=None,
+                 followlinks=False, hidden=False, ordered=True, cache=None):
+        self.top = top
+        self.jobs = jobs
+        self.limit = max(1, jobs * walk_read_ahead)
+        self.level = level
+        self.topdown = topdown
+        self.onerror = onerror
+        self.followlinks = followlinks
+        self.hidden = hidden
+        self.ordered = ordered
+        self.cache = cache
+        self.__tasks = queue.Queue()
+        self.__results = queue.Queue()
+        self.__stopped = False
+        self.__pending = 0
+        self.__done = {}
+        self.__submitted = set()
+        self.__backlog = []
+
+    def __iter__(self):
+        threads = []
+        for i in range(self.jobs):
+            thread = threading.Thread(target=self.__work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            if self.ordered and self.topdown:
+                walker = self.__ordered_topdown()
+            elif self.ordered:
+                walker = self.__ordered_bottomup()
+            elif self.topdown:
+                walker = self.__unordered_topdown()
+            else:
+                walker = self.__unordered_bottomup()
+            for x in walker:
+                yield x
+        finally:
+            self.__stopped = True
+            for thread in threads:
+                self.__tasks.put(None)
+            for thread in threads:
+                thread.join()
+
+    def __work(self):
+        """Worker thread loop: lists queued directories and groups their
+        files into sequences.
+        """
+        while True:
+            task = self.__tasks.get()
+            if task is None:
+                return
+            if self.__stopped:
+                continue
+            path, depth = task
+            try:
+                result = _scan(path, self.hidden, self.cache)
+            except Exception as err:
+                result = err
+            self.__results.put((path, depth, result))
+
+    def __submit(self, path, depth):
+        self.__pending += 1
+        self.__tasks.put((path, depth))
+
+    def __ahead(self):
+        """:return: number of directories queued or listed and not yet
+        taken by the walk."""
+        return self.__pending + len(self.__done)
+
+    def __prefetch(self, upcoming):
+        """Submits the directories of upcoming, (path, depth) pairs in the
+        order the walk needs them, until limit are listed ahead. The first
+        one is always submitted since the walk waits for it next.
+        """
+        for i, (path, depth) in enumerate(upcoming):
+            if i and self.__ahead() >= self.limit:
+                return
+            if path not in self.__submitted:
+                self.__submitted.add(path)
+                self.__submit(path, depth)
+
+    def __fill(self):
+        """Submits directories from the backlog, most recently found first,
+        until limit are listed ahead.
+        """
+        while self.__backlog and self.__ahead() < self.limit:
+            self.__submit(*self.__backlog.pop())
+
+    def __children(self, path, dirs, links):
+        return [os.path.join(path, d) for d in dirs
+                if self.followlinks or d not in links]
+
+    def __receive(self):
+        """Waits for the next listing and stores it as
+        (dirs, seqs, children, links, depth), or None if it failed.
+        """
+        path, depth, result = self.__results.get()
+        self.__pending -= 1
+        if isinstance(result, Exception):
+            if not isinstance(result, OSError):
+                raise result
+            if self.onerror is not None:
+                self.onerror(result)
+            self.__done[path] = None
+            return path
+
+        dirs, links, seqs = result
+        if self.topdown and depth == self.level - 1:
+            del dirs[:]
+        children = self.__children(path, dirs, links)
+        self.__done[path] = (dirs, seqs, children, links, depth)
+        return path
+
+    def __wait(self, path):
+        while path not in self.__done:
+            self.__receive()
+        self.__submitted.discard(path)
+        return self.__done.pop(path)
+
+    def __ordered_topdown(self):
+        stack = [(self.top, 0)]
+        while stack:
+            self.__prefetch(reversed(stack))
+            path, depth = stack.pop()
+            result = self.__wait(path)
+            if result is None:
+                continue
+            dirs, seqs, children = result[:3]
+            yield path, dirs, seqs
+            # honour dirs removed by the caller, as os.walk does
+            stack.extend((c, depth + 1) for c in reversed(children)
+                         if os.path.basename(c) in dirs)
+
+    def __unordered_topdown(self):
+        self.__backlog.append((self.top, 0))
+        while True:
+            self.__fill()
+            if not self.__pending:
+                return
+            path = self.__receive()
+            result = self.__done.pop(path)
+            if result is None:
+                continue
+            dirs, seqs, children, links, depth = result
+            yield path, dirs, seqs
+            # subdirectories are queued after the caller had a chance to
+            # prune them, as os.walk does
+            for child in self.__children(path, dirs, links):
+                self.__backlog.append((child, depth + 1))
+
+    def __ordered_bottomup(self):
+        # directories already listed are kept on the stack with their
+        # listing until their subdirectories have been yielded
+        stack = [(self.top, 0, None)]
+        while stack:
+            path, depth, result = stack.pop()
+            if result is not None:
+                yield path, result[0], result[1]
+                continue
+            self.__prefetch(itertools.chain(
+                [(path, depth)],
+                ((p, d) for p, d, r in reversed(stack) if r is None)))
+            result = self.__wait(path)
+            if result is None:
+                continue
+            stack.append((path, depth, result))
+            stack.extend((c, depth + 1, None) for c in reversed(result[2]))
+
+    def __unordered_bottomup(self):
+        parents = {}
+        remaining = {}
+        self.__backlog.append((self.top, 0))
+        while True:
+            self.__fill()
+            if not self.__pending:
+                return
+            path = self.__receive()
+            result = self.__done.get(path)
+            if result is not None and result[2]:
+                # keep the listing until its subdirectories are yielded
+                self.__done.pop(path)
+                remaining[path] = [len(result[2]), result]
+                for child in result[2]:
+                    parents[child] = path
+                    self.__backlog.append((child, result[4] + 1))
+                continue
+            # a leaf (or a failed listing) completes its parents
+            result = self.__done.pop(path)
+            while path is not None:
+                if result is not None:
+                    yield path, result[0], result[1]
+                path = parents.pop(path, None)
+                if path is None:
+                    break
+                remaining[path][0] -= 1
+                if remaining[path][0]:
+                    break
+                result = remaining.pop(path)[1]
+
+
+def walk(source, level=-1, topdown=True, onerror=None, followlinks=False,
+         hidden=False, jobs=1, ordered=True, cache=None):
     """Generator that traverses a directory structure starting at
     source looking for sequences.
 
@@ -1163,27 +3830,928 @@ def walk(source, level=-1, topdown=True, onerror=None, followlinks=False, hidden
     :param onerror: callable to handle os.listdir errors
     :param followlinks: whether to follow links
     :param hidden: include hidden files and dirs
+    :param jobs: number of threads listing directories concurrently
+    :param ordered: when jobs > 1, yield in the same order as a serial walk
+                    instead of as soon as each directory has been listed
+    :param cache: :class:`.ScanCache` to read unchanged directories from,
+                  or True to use one in $PYSEQ_CACHE_DIR if it is set.
+                  No cache is used by default.
     """
-    start = datetime.now()
     assert isinstance(source, basestring) is True
     assert os.path.exists(source) is True
     source = os.path.abspath(source)
 
-    for root, dirs, files in os.walk(source, topdown, onerror, followlinks):
+    owned = cache is True
+    if owned:
+        cache = _default_cache()
+    elif cache is False:
+        cache = None
+
+    try:
+        if jobs > 1:
+            walker = _ParallelWalker(source, jobs, level, topdown, onerror,
+                                     followlinks, hidden, ordered, cache)
+            for root, dirs, seqs in walker:
+                yield root, dirs, seqs
+        else:
+            for root, dirs, seqs in _walk(source, topdown, onerror,
+                                          followlinks, hidden, cache):
+                if topdown is True:
+                    parts = root.replace(source, "").split(os.sep)
+                    while "" in parts:
+                        parts.remove("")
+                    if len(parts) == level - 1:
+                        del dirs[:]
+
+                yield root, dirs, seqs
+    finally:
+        if cache is not None:
+            if owned:
+                cache.close()
+            else:
+                cache.flush()
+
+
+class Snapshot(object):
+    """The sequences found under a directory tree at one point in time,
+    each reduced to its frame ranges, total size and latest mtime, so a
+    snapshot of millions of files stays small enough to keep between
+    scans and compare with diff_snapshots(). For example:
+
+        >>> snap = snapshot('/shows/abc/renders')
+        >>> snap.save('/var/tmp/renders.json')
+        >>> old = Snapshot.load('/var/tmp/renders.json')
+
+    Sequences are identified by their directory and their head, padding
+    and tail, e.g. ('/shows/abc/renders', 'a.%04d.exr'). A single file is
+    identified by its name, so a file that gets a sibling is reported as
+    deleted and its new sequence as created, as watch() does.
+    """
+
+    version = 1
+
+    def __init__(self, root=None, time=None):
+        """
+        :param root: absolute path of the scanned directory.
+        :param time: time of the scan, in seconds since the epoch.
+        """
+        self.root = root
+        self.time = time
+        self.__entries = {}
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __repr__(self):
+        return '<pyseq.Snapshot "%s" %d sequences>' % (self.root, len(self))
+
+    def entries(self):
+        """:return: dict of (dirname, name) -> (FrameSet, size, mtime), size
+        and mtime are None if the items were not stat'ed."""
+        return self.__entries
 
-        if not hidden:
-            files = [f for f in files if not f[0] == '.']
-            dirs[:] = [d for d in dirs if not d[0] == '.']
+    def add(self, seq, stat=True):
+        """Adds a sequence to the snapshot, merged with any sequence with the
+        same directory and name. Empty sequences are skipped.
 
-        files = [os.path.join(root, f) for f in files]
+        :param seq: pyseq.Sequence instance.
+        :param stat: record the total size and latest mtime of its items.
+        """
+        if not len(seq):
+            return
+        head, pad, tail = seq._layout()
+        key = (seq[0].dirname, head + pad + tail)
+        frames = seq.frameset()
+        size = mtime = None
+        if stat:
+            try:
+                size, mtime = seq.size, seq.mtime
+            except OSError as err:
+                log.debug('snapshot: %s' % err)
+        self._add(key, frames, size, mtime)
+
+    def _add(self, key, frames, size, mtime):
+        old = self.__entries.get(key)
+        if old is not None:
+            frames = old[0] | frames
+            if size is not None and old[1] is not None:
+                size, mtime = size + old[1], max(mtime, old[2])
+            else:
+                size = mtime = None
+        self.__entries[key] = (frames, size, mtime)
+
+    def save(self, path):
+        """Writes the snapshot to a JSON file, with a table of the directories
+        and the frame ranges of each sequence as flat [start, end, ...] lists.
+
+        :param path: path of the file to write.
+        """
+        dirs, index, seqs = [], {}, []
+        for (dirname, name), (frames, size, mtime) in \
+                sorted(self.__entries.items()):
+            if dirname not in index:
+                index[dirname] = len(dirs)
+                dirs.append(dirname)
+            seqs.append([index[dirname], name,
+                         [x for r in frames.ranges() for x in r],
+                         size, mtime])
+        data = {'version': self.version, 'root': self.root,
+                'time': self.time, 'dirs': dirs, 'sequences': seqs}
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(data, fp, separators=(',', ':'))
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a snapshot written by save().
+
+        :param path: path of the file to read.
+
+        :raises SequenceError: if the file is not a pyseq snapshot.
+
+        :return: Snapshot instance.
+        """
+        with open(path) as fp:
+            try:
+                data = json.load(fp)
+            except ValueError as err:
+                raise SequenceError('Invalid snapshot %s: %s' % (path, err))
+        if not isinstance(data, dict) or data.get('version') != cls.version:
+            raise SequenceError('Invalid snapshot %s' % path)
+        snap = cls(data['root'], data['time'])
+        dirs = data['dirs']
+        for dir_index, name, flat, size, mtime in data['sequences']:
+            frames = FrameSet.from_ranges(zip(flat[::2], flat[1::2]))
+            snap._add((dirs[dir_index], name), frames, size, mtime)
+        return snap
+
+
+def snapshot(source, level=-1, hidden=False, jobs=1, stat=True, cache=None):
+    """Walks a directory structure, see walk(), and records its sequences
+    in a Snapshot.
+
+    :param source: valid folder path to traverse
+    :param level: int, if < 0 traverse entire structure otherwise
+                  traverse to given depth
+    :param hidden: include hidden files and dirs
+    :param jobs: number of threads listing directories concurrently
+    :param stat: record the total size and latest mtime of each sequence,
+                 stat'ing the items of each directory concurrently
+    :param cache: :class:`.ScanCache` or True, see walk()
+
+    :return: Snapshot instance.
+    """
+    snap = Snapshot(os.path.abspath(source), time.time())
+    for root, dirs, seqs in walk(source, level, hidden=hidden, jobs=jobs,
+                                 cache=cache):
+        if stat:
+            stat_sequences(seqs)
+        for seq in seqs:
+            snap.add(seq, stat)
+    return snap
+
+
+def diff_snapshots(a, b):
+    """Compares two snapshots of the same tree and returns the changes from
+    a to b as (event, path, frames) tuples sorted by directory and name,
+    where path is the directory joined with the sequence name, e.g.
+    '/renders/a.%04d.exr'.
+    The events match those of watch():
+
+        ``created``  a new sequence, with all its frames
+        ``deleted``  a sequence is gone, with the frames it had
+        ``appended`` frames added to a sequence
+        ``removed``  frames deleted from a sequence
+        ``modified`` same frames, but the total size or latest mtime
+                     changed, with all its frames
+
+    Frames are compared as ranges, so the cost depends on the number of
+    sequences and gaps, not the number of files. As only the totals are
+    kept, a frame rewritten while others are added or removed is not
+    reported as modified. For example:
+
+        >>> for event, path, frames in diff_snapshots(old, new):
+        ...     print(event, path, frames.ranges())
+        appended /renders/a.%04d.exr [(101, 120)]
+
+    :param a: older Snapshot instance.
+    :param b: newer Snapshot instance.
+
+    :return: list of (event, path, FrameSet) tuples.
+    """
+    old, new = a.entries(), b.entries()
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        path = os.path.join(*key)
+        if key not in old:
+            changes.append(('created', path, new[key][0]))
+        elif key not in new:
+            changes.append(('deleted', path, old[key][0]))
+        else:
+            before, after = old[key], new[key]
+            appended = after[0] - before[0]
+            removed = before[0] - after[0]
+            if appended:
+                changes.append(('appended', path, appended))
+            if removed:
+                changes.append(('removed', path, removed))
+            if not appended and not removed and before[1:] != after[1:] \
+                    and None not in before[1:] + after[1:]:
+                changes.append(('modified', path, after[0]))
+    return changes
+
+
+# manifest file layout, see dump()
+manifest_magic = b'PYSEQMF\0'
+manifest_version = 1
+_manifest_header = struct.Struct('<8sIIIIQQ')
+_manifest_record = struct.Struct('<IIIIQQQQ')
+
+# flag set when a manifest has per-frame size and mtime arrays
+MANIFEST_STAT = 1
+
+
+def _encode_name(name):
+    """Returns a file or directory name as bytes, keeping undecodable
+    names as they were listed.
+    """
+    if isinstance(name, bytes):
+        return name
+    if str is unicode:
+        return name.encode('utf-8', 'surrogateescape')
+    return name.encode('utf-8')
+
+
+def _decode_name(data):
+    """Returns a name stored by _encode_name() as a native string.
+    """
+    if str is unicode:
+        return data.decode('utf-8', 'surrogateescape')
+    return data
+
+
+def _write_values(fp, code, values, chunk_size=65536):
+    """Writes numbers as little-endian struct values of the given code.
+    """
+    for i in range(0, len(values), chunk_size):
+        chunk = values[i:i + chunk_size]
+        fp.write(struct.pack('<%d%s' % (len(chunk), code), *chunk))
+
+
+def dump(seqs, path, stat=False):
+    """Writes sequences to a compact binary manifest that load() maps into
+    memory, keeping their frame ranges and, with stat, the size and mtime
+    of every file. All numbers are little-endian, in this order:
+
+        header     magic 'PYSEQMF\\0', version, flags, string count,
+                   sequence count (uint32 each), range count and frame
+                   count (uint64 each)
+        strings    string count + 1 uint64 offsets into the UTF-8 string
+                   data that follows, padded to 8 bytes. The directories,
+                   heads, paddings and tails of the sequences are stored
+                   once each
+        sequences  per sequence, the string indices of its directory,
+                   head, padding and tail (uint32 each), and its first
+                   range, range count, first frame and length (uint64
+                   each)
+        ranges     (start, end) inclusive frame ranges, as int64 pairs
+        sizes      with the MANIFEST_STAT flag, the size of each frame in
+                   the order of the ranges, as int64
+        mtimes     with the MANIFEST_STAT flag, the mtime of each frame,
+                   as float64
+
+    A sequence of one file has no padding and no ranges, its name is its
+    head and tail. For example:
+
+        >>> dump(get_sequences('./tests/files/'), 'files.pyseq', stat=True)
+        >>> seqs = load('files.pyseq')
+
+    :param seqs: list of pyseq.Sequence objects.
+    :param path: path of the file to write.
+    :param stat: store the size and mtime of the items, stat'ing them
+                 concurrently first, see stat_sequences().
+
+    :raises SequenceError: if a sequence has frames of a different width
+        than its padding, with strict_pad disabled.
+    """
+    if stat:
+        stat_sequences(seqs)
+    strings, index = [], {}
+
+    def string(value):
+        value = _encode_name(value)
+        if value not in index:
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    records = []
+    ranges = []
+    sizes, mtimes = array(frame_typecode), array('d')
+    for seq in seqs:
+        head, pad, tail = seq._layout()
+        dirname = seq[0].dirname if len(seq) else ''
+        if pad:
+            frames = seq.frameset()
+            if strict_pad is False:
+                for item in seq:
+                    if item.name != head + pad % item.frame + tail:
+                        raise SequenceError(
+                            '%s does not match the padding of %s' %
+                            (item.name, seq))
+        else:
+            frames = FrameSet()
+        records.append((string(dirname), string(head), string(pad),
+                        string(tail), len(ranges) // 2,
+                        len(frames.ranges()), len(sizes), len(seq)))
+        for start, end in frames.ranges():
+            ranges.extend((start, end))
+        if stat:
+            if pad:
+                items = dict((item.frame, item) for item in seq)
+                items = [items[frame] for frame in frames]
+            else:
+                items = list(seq)
+            for item in items:
+                sizes.append(item.size)
+                mtimes.append(item.mtime)
+
+    data = b''.join(strings)
+    offsets = [0]
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fp:
+        fp.write(_manifest_header.pack(
+            manifest_magic, manifest_version, MANIFEST_STAT if stat else 0,
+            len(strings), len(records), len(ranges) // 2, len(sizes)))
+        _write_values(fp, 'Q', offsets)
+        fp.write(data + b'\0' * (-len(data) % 8))
+        for record in records:
+            fp.write(_manifest_record.pack(*record))
+        _write_values(fp, 'q', ranges)
+        _write_values(fp, 'q', sizes)
+        _write_values(fp, 'd', mtimes)
+    os.rename(tmp, path)
+
+
+class _ManifestSequence(VirtualSequence):
+    """VirtualSequence read from a manifest, whose items get their size and
+    mtime from the manifest instead of the disk.
+    """
+
+    def __init__(self, head, pad, tail, frames, dirname, manifest, first):
+        super(_ManifestSequence, self).__init__(head, pad, tail, frames,
+                                                dirname)
+        self.__frames = FrameSet.from_ranges(frames.ranges())
+        self.__manifest = manifest
+        self.__first = first
+
+    def _item(self, frame):
+        item = super(_ManifestSequence, self)._item(frame)
+        if frame in self.__frames:
+            item._set_stat(self.__manifest._stat(
+                self.__first + self.__frames.index(frame)))
+        return item
+
+    @property
+    def size(self):
+        """Returns the size of all items, from the manifest while the frames
+        are unchanged.
+        """
+        if self.frameset() == self.__frames:
+            return self.__manifest._totals(self.__first, len(self))[0]
+        return super(_ManifestSequence, self).size
+
+    @property
+    def mtime(self):
+        """Returns the latest mtime of all items, from the manifest while
+        the frames are unchanged.
+        """
+        if self.frameset() == self.__frames:
+            return self.__manifest._totals(self.__first, len(self))[1]
+        return super(_ManifestSequence, self).mtime
+
+
+class Manifest(object):
+    """Read-only list of the sequences in a manifest written by dump(), see
+    load(). The file is memory-mapped and each sequence is only read and
+    built when it is first accessed, as a VirtualSequence, or a Sequence for
+    a single file. With the MANIFEST_STAT flag, their items have the size
+    and mtime that were stored, read from the file while it is open.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the manifest file.
+
+        :raises SequenceError: if the file is not a pyseq manifest.
+        """
+        self.path = path
+        self.__seqs = {}
+        self.__closed = False
+        with open(path, 'rb') as fp:
+            try:
+                self.__map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError) as err:
+                raise SequenceError('Invalid manifest %s: %s' % (path, err))
+        try:
+            header = _manifest_header.unpack_from(self.__map, 0)
+        except struct.error:
+            header = None
+        if header is None or header[0] != manifest_magic or \
+                header[1] != manifest_version:
+            self.close()
+            raise SequenceError('Invalid manifest %s' % path)
+        self.flags, strings, self.__count, ranges, frames = header[2:]
+        self.__offsets = _manifest_header.size
+        self.__strings = self.__offsets + 8 * (strings + 1)
+        length = self.__read('Q', self.__offsets + 8 * strings, 1)[0]
+        self.__records = self.__strings + length + (-length % 8)
+        self.__ranges = self.__records + _manifest_record.size * self.__count
+        self.__sizes = self.__ranges + 16 * ranges
+        self.__mtimes = self.__sizes + 8 * frames
+        if self.flags & MANIFEST_STAT:
+            end = self.__mtimes + 8 * frames
+        else:
+            end = self.__sizes
+        if len(self.__map) < end:
+            self.close()
+            raise SequenceError('Truncated manifest %s' % path)
+
+    def __len__(self):
+        return self.__count
+
+    def __repr__(self):
+        return '<pyseq.Manifest "%s" %d sequences>' % (self.path, len(self))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('manifest index out of range')
+        seq = self.__seqs.get(index)
+        if seq is None:
+            seq = self.__seqs[index] = self.__build(index)
+        return seq
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Unmaps the file. Sequences with stored sizes and mtimes read
+        them from the file, so once it is closed, reading their items, size
+        or mtime raises SequenceError, as does building new sequences.
+        Their frame numbers can still be read with frameset().
+        """
+        self.__closed = True
+        self.__map.close()
+
+    def __data(self):
+        """Returns the mapped file, or raises SequenceError once closed.
+        """
+        if self.__closed:
+            raise SequenceError('Manifest %s is closed' % self.path)
+        return self.__map
+
+    def __read(self, code, offset, count):
+        return struct.unpack_from('<%d%s' % (count, code), self.__data(),
+                                  offset)
+
+    def __string(self, index):
+        start, end = self.__read('Q', self.__offsets + 8 * index, 2)
+        return _decode_name(
+            self.__data()[self.__strings + start:self.__strings + end])
+
+    def __build(self, index):
+        record = _manifest_record.unpack_from(
+            self.__data(), self.__records + _manifest_record.size * index)
+        dirname, head, pad, tail = [self.__string(i) for i in record[:4]]
+        dirname = _intern(dirname)
+        first_range, ranges, first, length = record[4:]
+        if not pad:
+            if length != 1:
+                raise SequenceError('Invalid manifest %s: sequence %d has '
+                                    'no padding and %d items' %
+                                    (self.path, index, length))
+            item = Item(os.path.join(dirname, head + tail))
+            if self.flags & MANIFEST_STAT:
+                item._set_stat(self._stat(first))
+            return Sequence([item])
+        values = self.__read('q', self.__ranges + 16 * first_range,
+                             2 * ranges)
+        frames = FrameSet.from_ranges(zip(values[::2], values[1::2]))
+        if not self.flags & MANIFEST_STAT:
+            return VirtualSequence(head, pad, tail, frames, dirname)
+        return _ManifestSequence(head, pad, tail, frames, dirname, self,
+                                 first)
+
+    def _stat(self, frame):
+        """Returns a stat result with the stored size and mtime of the frame
+        at the given position in the manifest.
+        """
+        size = self.__read('q', self.__sizes + 8 * frame, 1)[0]
+        mtime = self.__read('d', self.__mtimes + 8 * frame, 1)[0]
+        return os.stat_result((0, 0, 0, 0, 0, 0, size, mtime, mtime, mtime))
+
+    def _totals(self, first, count):
+        """Returns the total size and latest mtime of count frames from the
+        given position in the manifest, or (0, None) if count is 0.
+        """
+        if not count:
+            return 0, None
+        sizes = self.__read('q', self.__sizes + 8 * first, count)
+        mtimes = self.__read('d', self.__mtimes + 8 * first, count)
+        return sum(sizes), max(mtimes)
+
+
+def load(path):
+    """Opens a manifest written by dump(). The file is memory-mapped, so
+    opening it does not depend on its size, and sequences are built when
+    they are accessed. For example:
+
+        >>> with load('files.pyseq') as seqs:
+        ...     for seq in seqs:
+        ...         print(seq.format('%h%p%t %r %d'))
+
+    :param path: path of the manifest file.
+
+    :raises SequenceError: if the file is not a pyseq manifest.
+
+    :return: :class:`.Manifest` instance.
+    """
+    return Manifest(path)
+
+
+# inotify event masks, see inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+
+class _Inotify(object):
+    """Minimal ctypes binding of the Linux inotify API.
+    """
+
+    # size of the fixed part of struct inotify_event
+    header = struct.calcsize('iIII')
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init = libc.inotify_init
+        except AttributeError:
+            raise NotImplementedError('inotify is not available')
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._get_errno = ctypes.get_errno
+        self.fd = init()
+        if self.fd < 0:
+            self._raise()
+
+    def _raise(self, path=None):
+        err = self._get_errno()
+        raise OSError(err, os.strerror(err), path)
+
+    def add_watch(self, path, mask):
+        """:return: watch descriptor of path."""
+        if not isinstance(path, bytes):
+            try:
+                path = os.fsencode(path)
+            except AttributeError:
+                path = path.encode('utf-8')
+        wd = self._add_watch(self.fd, path, mask)
+        if wd < 0:
+            self._raise(path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):
+        """Waits up to timeout seconds for events.
+
+        :return: list of (wd, mask, cookie, name) tuples.
+        """
+        ready = select.select([self.fd], [], [], timeout)[0]
+        if not ready:
+            return []
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = struct.unpack_from('iIII', data,
+                                                          offset)
+            offset += self.header
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if not isinstance(name, str):
+                name = os.fsdecode(name)
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Watcher(object):
+    """Keeps a SequenceIndex of each directory of a tree up to date from
+    inotify events, and turns the changes into sequence events for
+    :func:`watch`.
+    """
+
+    dir_mask = _IN_CREATE | _IN_MOVED_TO | _IN_MOVED_FROM | _IN_DELETE | \
+        _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR
+
+    def __init__(self, source, level=-1, hidden=False):
+        self.source = os.path.abspath(source)
+        self.level = level
+        self.hidden = hidden
+        self.inotify = _Inotify()
+        # wd -> path, path -> (wd, depth, SequenceIndex)
+        self.paths = {}
+        self.dirs = {}
+        # id(seq) -> (seq, missing frame count) of each directory
+        self.states = {}
+        self.pending = []
+        self.add_dir(self.source, 0, emit=False)
+
+    def close(self):
+        self.inotify.close()
+
+    def add_dir(self, path, depth, emit=True):
+        """Watches a directory and its subdirectories, down to level,
+        unless it is watched already.
+        """
+        if path in self.dirs:
+            return
+        try:
+            # watch before listing so files added meanwhile are not missed
+            wd = self.inotify.add_watch(path, self.dir_mask)
+            dirs, files, links = _scan_dir(path)
+        except OSError as err:
+            log.debug('watch: %s' % err)
+            return
+        if not self.hidden:
+            files = [f for f in files if not f.name[0] == '.']
+            dirs = [d for d in dirs if not d[0] == '.']
+        index = SequenceIndex(files)
+        self.paths[wd] = path
+        self.dirs[path] = (wd, depth, index)
+        self.states[path] = {}
+        self.update(path, emit=emit)
+        if self.level < 0 or depth < self.level - 1:
+            for name in dirs:
+                if name not in links:
+                    self.add_dir(os.path.join(path, name), depth + 1, emit)
+
+    def remove_dir(self, path):
+        """Stops watching a directory and its subdirectories, reporting
+        their sequences as deleted.
+        """
+        prefix = path + os.sep
+        for other in [x for x in self.dirs if x == path or
+                      x.startswith(prefix)]:
+            wd, depth, index = self.dirs.pop(other)
+            self.paths.pop(wd, None)
+            self.inotify.rm_watch(wd)
+            for seq, missing in self.states.pop(other).values():
+                self.pending.append(('deleted', seq, seq.frames()))
+
+    def update(self, path, seq=None, frame=None, added=True, emit=True):
+        """Compares the sequences of a directory with their last known
+        state and queues the events. seq and frame are the sequence and
+        frame number of the file that was added, or removed, if any.
+        """
+        index = self.dirs[path][2]
+        before = self.states[path]
+        after = {}
+        events = []
+        for other in index.sequences():
+            missing = sum(end - start + 1 for start, end
+                          in other.frameset().gaps())
+            after[id(other)] = (other, missing)
+            old = before.pop(id(other), None)
+            if old is None or old[0] is not other:
+                if old is not None:
+                    events.append(('deleted', old[0], old[0].frames()))
+                events.append(('created', other, other.frames()))
+                if missing:
+                    events.append(('missing', other,
+                                   other.missing(expand=True)))
+                continue
+            if other is seq and frame is not None:
+                events.append((added and 'appended' or 'removed', other,
+                               [frame]))
+                if missing > old[1]:
+                    if added:
+                        gaps = [g for g in other.frameset().gaps()
+                                if g[1] == frame - 1 or g[0] == frame + 1]
+                    else:
+                        gaps = [(frame, frame)]
+                    events.append(('missing', other, [
+                        x for start, end in gaps for x in range(start, end + 1)
+                    ]))
+            if old[1] and not missing and added:
+                events.append(('complete', other, []))
+        for other, missing in before.values():
+            events.append(('deleted', other, other.frames()))
+        self.states[path] = after
+        if emit:
+            self.pending.extend(events)
+
+    def add_file(self, path, name):
+        full = os.path.join(path, name)
+        index = self.dirs[path][2]
+        if full in index:
+            return
+        seq = index.add(full)
+        self.update(path, seq, index._items[full][0].frame)
+
+    def remove_file(self, path, name):
+        full = os.path.join(path, name)
+        index = self.dirs[path][2]
+        if full not in index:
+            return
+        frame = index._items[full][0].frame
+        seq = index.remove(full)
+        self.update(path, seq, frame, added=False)
+
+    def resync(self):
+        """Walks the tree again after events were lost: directories that
+        are gone stop being watched, new ones are watched, and the files
+        of the others are compared with their index.
+        """
+        children = {}
+        for path in self.dirs:
+            children.setdefault(os.path.dirname(path), []).append(path)
+        self.resync_dir(self.source, 0, children)
+
+    def resync_dir(self, path, depth, children):
+        """Lists a directory and its subdirectories again, see resync().
+
+        :param children: dict of the watched subdirectories of each
+                         directory, from before the resync.
+        """
+        if path not in self.dirs:
+            self.add_dir(path, depth)
+            return
+        wd, depth, index = self.dirs[path]
+        try:
+            new_wd = self.inotify.add_watch(path, self.dir_mask)
+            dirs, files, links = _scan_dir(path)
+        except OSError:
+            self.remove_dir(path)
+            return
+        if new_wd != wd:
+            # the directory was replaced by another one
+            self.remove_dir(path)
+            self.add_dir(path, depth)
+            return
+        if not self.hidden:
+            files = [f for f in files if not f.name[0] == '.']
+            dirs = [d for d in dirs if not d[0] == '.']
+        names = set(f.name for f in files)
+        for item in list(index._items.values()):
+            if item[0].name not in names:
+                self.remove_file(path, item[0].name)
+        for name in names:
+            self.add_file(path, name)
+
+        wanted = []
+        if self.level < 0 or depth < self.level - 1:
+            wanted = [os.path.join(path, d) for d in dirs if d not in links]
+        for child in children.get(path, []):
+            if child not in wanted and child in self.dirs:
+                self.remove_dir(child)
+        for child in wanted:
+            self.resync_dir(child, depth + 1, children)
+
+    @staticmethod
+    def _is_link(path):
+        """Returns True if path is a symbolic link.
+        """
+        return os.path.islink(path)
+
+    def read(self, timeout=None):
+        """Waits up to timeout seconds for changes.
+
+        :return: list of (event, seq, frames) tuples, or None if nothing
+                 changed before timeout.
+        """
+        changes = self.inotify.read(timeout)
+        if not changes:
+            return None
+        for wd, mask, cookie, name in changes:
+            if mask & _IN_Q_OVERFLOW:
+                log.warning('watch: inotify queue overflow, listing again')
+                self.resync()
+                continue
+            path = self.paths.get(wd)
+            if path is None or path not in self.dirs:
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                self.remove_dir(path)
+                continue
+            if not name or (not self.hidden and name[0] == '.'):
+                continue
+            full = os.path.join(path, name)
+            if mask & _IN_ISDIR:
+                depth = self.dirs[path][1]
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    if self.level < 0 or depth < self.level - 1:
+                        self.add_dir(full, depth + 1)
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    self.remove_dir(full)
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                self.add_file(path, name)
+            elif mask & _IN_CREATE and self._is_link(full):
+                # symlinks are not written, so no IN_CLOSE_WRITE follows
+                self.add_file(path, name)
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                self.remove_file(path, name)
+        events, self.pending = self.pending, []
+        return events
+
+
+def watch(source, callback, level=-1, hidden=False, timeout=None):
+    """Watches a directory structure for changes to its sequences with
+    Linux inotify, calling callback(event, seq, frames) for each change.
+    Files are added when they are closed after writing, moved in, or
+    created as symbolic links, so frames being rendered are reported once
+    they are complete. Directories are walked again if inotify events are
+    lost.
+
+    The events are:
+
+        ``created``  a new sequence, with all its frames
+        ``appended`` frames added to a sequence
+        ``missing``  frames newly missing between the start and end
+        ``removed``  frames deleted from a sequence
+        ``complete`` a sequence has no missing frames any more after
+                     frames were added
+        ``deleted``  a sequence is gone, with the frames it had
+
+    For example:
+
+        >>> def callback(event, seq, frames):
+        ...     print(event, seq.format('%h%p%t'), frames)
+        >>> watch('/shows/abc/renders', callback)
 
-        if topdown is True:
-            parts = root.replace(source, "").split(os.sep)
-            while "" in parts:
-                parts.remove("")
-            if len(parts) == level - 1:
-                del dirs[:]
+    A file that becomes a sibling of a single file replaces that file's
+    sequence, reported as deleted, with a new one.
 
-        yield root, dirs, get_sequences(files)
+    :param source: valid folder path to watch
+    :param callback: callable, watching stops when it returns False
+    :param level: int, if < 0 watch the entire structure otherwise
+                  watch to given depth
+    :param hidden: include hidden files and dirs
+    :param timeout: stop after this many seconds without changes
 
-    log.debug('time: %s' % (datetime.now() - start))
+    :exc:`NotImplementedError` raised if inotify is not available.
+    """
+    assert os.path.isdir(source) is True
+    watcher = _Watcher(source, level, hidden)
+    try:
+        while True:
+            events = watcher.read(timeout)
+            if events is None:
+                if timeout is not None:
+                    return
+                continue
+            for event, seq, frames in events:
+                if callback(event, seq, frames) is False:
+                    return
+    finally:
+        watcher.close()
+
+
+# asyncio API, see pyseq_aio (Python 3.7+)
+try:
+    import pyseq_aio as aio
+except (ImportError, SyntaxError):
+    aio = None
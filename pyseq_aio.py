@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------------------------
+# Copyright (c) 2011-2017, Ryan Galloway (ryan@rsgalloway.com)
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#  - Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+#  - Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+#  - Neither the name of the software nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+# -----------------------------------------------------------------------------
+
+"""asyncio versions of pyseq.iget_sequences, pyseq.walk and
+pyseq.stat_sequences for Python 3.7+, available as pyseq.aio, e.g. ::
+
+    async for root, dirs, seqs in pyseq.aio.walk('/shows/abc/renders'):
+        await pyseq.aio.stat_sequences(seqs)
+
+Directories are listed and files stat'ed on a thread pool shared by all the
+calls, $PYSEQ_AIO_WORKERS threads (default 16), so the event loop is never
+blocked by the filesystem. Each call runs at most limit operations at once,
+$PYSEQ_AIO_LIMIT (default 4), so one request cannot take all the threads,
+and walks only list a few directories ahead of the caller. The results are
+the same as the sync functions.
+"""
+
+import os
+import asyncio
+import collections
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+import pyseq
+
+__all__ = ['get_sequences', 'walk', 'stat_sequences']
+
+# number of threads shared by all the calls
+workers = int(os.environ.get('PYSEQ_AIO_WORKERS', 16))
+
+# number of operations each call runs at once
+default_limit = int(os.environ.get('PYSEQ_AIO_LIMIT', 4))
+
+# number of items stat'ed by each thread pool task
+stat_batch_size = 64
+
+# number of sequences get_sequences() groups in each thread pool task
+sequence_batch_size = 64
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _default_executor():
+    """Returns the thread pool shared by all the calls, created on first
+    use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers)
+        return _executor
+
+
+class _Runner(object):
+    """Runs blocking functions on an executor, at most limit at a time.
+    """
+
+    def __init__(self, limit=None, executor=None):
+        self.limit = max(1, limit or default_limit)
+        self.executor = executor or _default_executor()
+        self.__semaphore = asyncio.Semaphore(self.limit)
+        self.__tasks = set()
+        self.__jobs = set()
+        self.__closed = False
+
+    async def run(self, func, *args):
+        async with self.__semaphore:
+            if self.__closed:
+                raise asyncio.CancelledError()
+            job = self.executor.submit(func, *args)
+            self.__jobs.add(job)
+            try:
+                return await asyncio.wrap_future(job)
+            finally:
+                if job.done():
+                    self.__jobs.discard(job)
+
+    def start(self, func, *args):
+        """Schedules func and returns its task.
+        """
+        task = asyncio.ensure_future(self.run(func, *args))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+        return task
+
+    async def close(self):
+        """Cancels the calls that have not started and waits for the ones
+        still running on the executor, so that what they use can be
+        released.
+        """
+        self.__closed = True
+        for task in self.__tasks:
+            task.cancel()
+        running = [job for job in self.__jobs if not job.cancel()]
+        self.__jobs.clear()
+        if running:
+            await asyncio.wait([asyncio.wrap_future(job) for job in running])
+
+
+def _next_batch(iterator, size):
+    """Returns a list of the next size items of iterator.
+    """
+    return list(itertools.islice(iterator, size))
+
+
+async def get_sequences(source, limit=None, executor=None, chunk_size=None):
+    """Async iterator over the sequences of source, in the order of
+    pyseq.iget_sequences(). The sequences are grouped on the executor
+    sequence_batch_size at a time and yielded as each batch is ready. For
+    example:
+
+        >>> async for seq in pyseq.aio.get_sequences('./tests/files/'):
+        ...     print(seq)
+
+    :param source: directory path, list of strings, list of pyseq.Items or
+                   glob, as for pyseq.iget_sequences().
+    :param limit: number of operations to run at once, defaults to
+                  $PYSEQ_AIO_LIMIT or 4.
+    :param executor: concurrent.futures.Executor, defaults to a thread pool
+                     shared by all the calls.
+    :param chunk_size: sort the names in chunks, see
+                       pyseq.iget_sequences().
+    """
+    runner = _Runner(limit, executor)
+    seqs = pyseq.iget_sequences(source, chunk_size)
+    try:
+        while True:
+            batch = await runner.run(_next_batch, seqs, sequence_batch_size)
+            for seq in batch:
+                yield seq
+            if len(batch) < sequence_batch_size:
+                return
+    finally:
+        await runner.close()
+        seqs.close()
+
+
+def _env_cache():
+    """Returns a pyseq.ScanCache in $PYSEQ_CACHE_DIR, or None if it is not
+    set or the cache cannot be opened.
+    """
+    if sqlite3 is None or not os.environ.get('PYSEQ_CACHE_DIR'):
+        return None
+    try:
+        return pyseq.ScanCache()
+    except (OSError, sqlite3.Error) as err:
+        pyseq.log.warning('cache: %s' % err)
+        return None
+
+
+def _scan(path, hidden, cache):
+    """Lists a directory and groups its files into sequences like
+    pyseq.walk(), returning its subdirectory names, the set of those that
+    are symlinks and its sequences. Unchanged directories are read from
+    cache, if given.
+    """
+    if cache is not None:
+        stat = os.stat(path)
+        result = cache.get(path, stat, hidden)
+        if result is not None:
+            return result
+
+    dirs = []
+    links = set()
+    files = []
+    for entry in pyseq.listdir(path, hidden):
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            dirs.append(entry.name)
+            if entry.is_symlink():
+                links.add(entry.name)
+        else:
+            files.append(entry)
+    seqs = pyseq.get_sequences(files)
+
+    if cache is not None:
+        cache.put(path, stat, dirs, links, seqs, hidden)
+    return dirs, links, seqs
+
+
+async def walk(source, level=-1, topdown=True, onerror=None,
+               followlinks=False, hidden=False, limit=None, executor=None,
+               cache=None):
+    """Async iterator over (root, dirs, seqs) for each directory under
+    source, in the same order as pyseq.walk(). Up to limit directories are
+    listed at once, and subdirectories are only listed ahead of the
+    caller while it is walking their parent, so a slow caller slows the
+    listing down. As with pyseq.walk(), removing names from dirs in a
+    top-down walk skips those subdirectories.
+
+    :param source: valid folder path to traverse
+    :param level: int, if < 0 traverse entire structure otherwise
+                  traverse to given depth
+    :param topdown: walk from the top down
+    :param onerror: callable to handle listing errors
+    :param followlinks: whether to follow links
+    :param hidden: include hidden files and dirs
+    :param limit: number of directories to list at once, defaults to
+                  $PYSEQ_AIO_LIMIT or 4.
+    :param executor: concurrent.futures.Executor, defaults to a thread pool
+                     shared by all the calls.
+    :param cache: :class:`pyseq.ScanCache` or True, see pyseq.walk()
+    """
+    assert os.path.exists(source) is True
+    source = os.path.abspath(source)
+
+    owned = cache is True
+    if owned:
+        cache = _env_cache()
+    elif cache is False:
+        cache = None
+
+    runner = _Runner(limit, executor)
+    try:
+        async for x in _walk(runner, source, 0, level, topdown, onerror,
+                             followlinks, hidden, cache):
+            yield x
+    finally:
+        # listings still running may be using the cache
+        await runner.close()
+        if cache is not None:
+            if owned:
+                cache.close()
+            else:
+                cache.flush()
+
+
+async def _walk(runner, top, depth, level, topdown, onerror, followlinks,
+                hidden, cache, listing=None):
+    """Walks top like pyseq.walk(), listing up to runner.limit of its
+    subdirectories ahead.
+
+    :param listing: task already listing top, if any.
+    """
+    if listing is None:
+        listing = runner.start(_scan, top, hidden, cache)
+    try:
+        dirs, links, seqs = await listing
+    except OSError as err:
+        if onerror is not None:
+            onerror(err)
+        return
+
+    if topdown is True and depth == level - 1:
+        del dirs[:]
+
+    if topdown:
+        yield top, dirs, seqs
+
+    names = iter([d for d in dirs if followlinks or d not in links])
+    pending = collections.deque()
+
+    def prefetch():
+        while len(pending) < runner.limit:
+            name = next(names, None)
+            if name is None:
+                return
+            path = os.path.join(top, name)
+            pending.append(
+                (path, runner.start(_scan, path, hidden, cache)))
+
+    try:
+        prefetch()
+        while pending:
+            path, task = pending.popleft()
+            prefetch()
+            async for x in _walk(runner, path, depth + 1, level, topdown,
+                                 onerror, followlinks, hidden, cache, task):
+                yield x
+    finally:
+        for path, task in pending:
+            task.cancel()
+
+    if not topdown:
+        yield top, dirs, seqs
+
+
+async def stat_sequences(seqs, limit=None, executor=None):
+    """Stats the items of all the sequences on the executor, see
+    pyseq.stat_sequences(), in batches of stat_batch_size items with at
+    most limit batches at once. For example:
+
+        >>> seqs = [s async for s in pyseq.aio.get_sequences('./tests/files/')]
+        >>> await pyseq.aio.stat_sequences(seqs)
+        >>> for s in seqs: print(s.format('%h%r%t %d'))
+
+    :param seqs: list of pyseq.Sequence objects.
+    :param limit: number of batches to stat at once, defaults to
+                  $PYSEQ_AIO_LIMIT or 4.
+    :param executor: concurrent.futures.Executor, defaults to a thread pool
+                     shared by all the calls.
+    """
+    runner = _Runner(limit, executor)
+    items = [i for seq in seqs if not isinstance(seq, pyseq.VirtualSequence)
+             for i in seq if not i._has_stat()]
+    starts = iter(range(0, len(items), stat_batch_size))
+
+    async def work():
+        for start in starts:
+            await runner.run(pyseq.stat_items,
+                             items[start:start + stat_batch_size], 1)
+
+    try:
+        await asyncio.gather(*[work() for _ in range(runner.limit)])
+    finally:
+        await runner.close()
@@ -14,6 +14,6 @@ setup(
     author='Ryan Galloway',
     author_email='ryan@rsgalloway.com',
     url='http://github.com/rsgalloway/pyseq',
-    py_modules=['pyseq'],
+    py_modules=['pyseq', 'pyseq_aio'],
     scripts = ['lss']
 )
@@ -30,18 +30,27 @@
 # POSSIBILITY OF SUCH DAMAGE.
 # -----------------------------------------------------------------------------
 
+import gc
 import os
 import re
+import json
 import random
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 import subprocess
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pyseq import Item, Sequence, diff, uncompress, get_sequences
-from pyseq import SequenceError
+from pyseq import SequenceError, FrameSet, SequenceIndex
 import pyseq
 pyseq.default_format = '%h%r%t'
 
+# the test files, so the tests can run from any directory
+files_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'files')
+
 class ItemTestCase(unittest.TestCase):
     """tests the Item class
     """
@@ -165,6 +174,45 @@ class ItemTestCase(unittest.TestCase):
             "can't set attribute"
         )
 
+    def test_attributes_are_resolved_lazily(self):
+        """testing if the path, name, digits and parts are only computed
+        when first accessed, and that items in the same directory share the
+        dirname string
+        """
+        def lists(item):
+            # the lists held by the item's slots or __dict__
+            refs = gc.get_referents(item)
+            refs += [v for r in refs if isinstance(r, dict)
+                     for v in r.values()]
+            return [r for r in refs if isinstance(r, list)]
+
+        i = Item(self.test_path)
+        self.assertEqual(lists(i), [])
+        self.assertEqual(i.head, 'file.0010.exr')
+        self.assertEqual(i.digits, ['0010'])
+        self.assertEqual(i.parts, ['file.', '.exr'])
+        self.assertEqual(sorted(lists(i)), [['0010'], ['file.', '.exr']])
+        j = Item(self.test_path.replace('0010', '0011'))
+        self.assertTrue(i.dirname is j.dirname)
+
+    def test_bytes_per_item(self):
+        """testing the memory used by a resolved Item, measured as the
+        instance, its __dict__ if any, the name and the digits and parts
+        lists. Before slots and lazy attributes this was 868 bytes on
+        python 3.11 and is now 508. Python 2 str subclasses cannot have
+        slots, so there it only drops from 1552 to 1512.
+        """
+        i = Item(self.test_path)
+        i.digits
+        size = sys.getsizeof(i) + sys.getsizeof(i.name)
+        for value in (i.digits, i.parts):
+            size += sys.getsizeof(value) + sum(map(sys.getsizeof, value))
+        if hasattr(i, '__dict__'):
+            size += sys.getsizeof(i.__dict__)
+            self.assertTrue(size <= 1512, size)
+        else:
+            self.assertTrue(size <= 508, size)
+
     def test_is_sibling_method_is_working_properly(self):
         """testing if the is_sibling() is working properly
         """
@@ -175,6 +223,118 @@ class ItemTestCase(unittest.TestCase):
         self.assertTrue(item2.is_sibling(item1))
 
 
+class FrameSetTestCase(unittest.TestCase):
+    """tests the FrameSet class
+    """
+
+    def test_ranges_and_gaps(self):
+        """testing if frames are stored as sorted inclusive ranges
+        """
+        fs = FrameSet([10, 1, 2, 3, 6, 5, 3])
+        self.assertEqual(fs.ranges(), [(1, 3), (5, 6), (10, 10)])
+        self.assertEqual(fs.gaps(), [(4, 4), (7, 9)])
+        self.assertEqual(str(fs), '1-3, 5-6, 10')
+        self.assertEqual(len(fs), 6)
+        self.assertEqual(fs.start(), 1)
+        self.assertEqual(fs.end(), 10)
+        self.assertEqual(list(fs), [1, 2, 3, 5, 6, 10])
+        self.assertTrue(5 in fs)
+        self.assertFalse(4 in fs)
+        self.assertFalse(0 in fs)
+
+    @unittest.skipIf(pyseq._import_numpy() is None, 'requires numpy')
+    def test_numpy_parity(self):
+        """testing if FrameSet, missing frames and the range directives are
+        the same with and without numpy
+        """
+        rand = random.Random(0)
+        cases = [
+            [5],
+            [3, 3, 3],
+            list(range(1, 101)),
+            [rand.randint(-50, 500) for _ in range(300)],
+            [rand.randint(1000, 1010) for _ in range(50)],
+            sorted(rand.sample(range(10 ** 9), 200)),
+        ]
+        fmt = '%s %e %l %r %R %M %m'
+        threshold = pyseq.numpy_threshold
+        try:
+            for frames in cases:
+                results = []
+                for pyseq.numpy_threshold in (10 ** 9, 0):
+                    fs = FrameSet(frames)
+                    seq = Sequence(['a.%d.exr' % f for f in sorted(set(frames))])
+                    results.append((fs.ranges(), fs.gaps(), len(fs), list(fs),
+                                    seq.format(fmt), seq.missing()))
+                self.assertEqual(results[0], results[1])
+        finally:
+            pyseq.numpy_threshold = threshold
+
+    def test_set_operations(self):
+        """testing if FrameSet set operations match python sets
+        """
+        rand = random.Random(0)
+        for _ in range(200):
+            a = set(rand.randrange(50) for _ in range(rand.randrange(40)))
+            b = set(rand.randrange(50) for _ in range(rand.randrange(40)))
+            fa, fb = FrameSet(a), FrameSet(b)
+            self.assertEqual(list(fa | fb), sorted(a | b))
+            self.assertEqual(list(fa & fb), sorted(a & b))
+            self.assertEqual(list(fa - fb), sorted(a - b))
+            self.assertEqual(list(fa ^ fb), sorted(a ^ b))
+            self.assertEqual(fa <= fb, a <= b)
+
+    def test_empty(self):
+        """testing an empty FrameSet
+        """
+        fs = FrameSet()
+        self.assertFalse(fs)
+        self.assertEqual(len(fs), 0)
+        self.assertEqual(fs.start(), None)
+        self.assertEqual(fs.ranges(), [])
+        self.assertEqual(fs.gaps(), [])
+
+    def test_from_ranges(self):
+        """testing if overlapping and adjacent ranges are merged
+        """
+        fs = FrameSet.from_ranges([(5, 8), (1, 3), (4, 4), (20, 1000000)])
+        self.assertEqual(fs.ranges(), [(1, 8), (20, 1000000)])
+        self.assertEqual(len(fs), 8 + 999981)
+        self.assertRaises(ValueError, FrameSet.from_ranges, [(3, 1)])
+
+    def test_add_and_discard(self):
+        """testing if add and discard merge and split ranges
+        """
+        fs = FrameSet([1, 3])
+        fs.add(2)
+        self.assertEqual(fs.ranges(), [(1, 3)])
+        fs.add(2)
+        self.assertEqual(len(fs), 3)
+        fs.add(5)
+        fs.add(0)
+        self.assertEqual(fs.ranges(), [(0, 3), (5, 5)])
+        fs.discard(2)
+        self.assertEqual(fs.ranges(), [(0, 1), (3, 3), (5, 5)])
+        fs.discard(5)
+        fs.discard(0)
+        fs.discard(7)
+        self.assertEqual(fs.ranges(), [(1, 1), (3, 3)])
+        self.assertEqual(len(fs), 2)
+
+    def test_indexing(self):
+        """testing if frames are found by index and indexes by frame
+        """
+        fs = FrameSet.from_ranges([(1, 3), (10, 10), (20, 1000000)])
+        self.assertEqual([fs[0], fs[2], fs[3], fs[4], fs[-1]],
+                         [1, 3, 10, 20, 1000000])
+        self.assertEqual(fs.index(21), 5)
+        self.assertRaises(IndexError, fs.__getitem__, len(fs))
+        self.assertRaises(ValueError, fs.index, 5)
+        fs.discard(2)
+        self.assertEqual(fs[1], 3)
+        self.assertEqual(fs.index(10), 2)
+
+
 class SequenceTestCase(unittest.TestCase):
     """tests the pyseq
     """
@@ -301,6 +461,21 @@ class SequenceTestCase(unittest.TestCase):
 
         self.assertRaises(SequenceError, s.__setslice__, 1, 2, 'item.001.ext')
 
+    def test_slice_assignment(self):
+        s = Sequence(["file.001.ext", "file.002.ext", "file.003.ext"])
+        self.assertEqual(s.frames(), [1, 2, 3])
+        s[1:3] = ["file.005.ext", Item("file.007.ext")]
+        self.assertEqual(len(s), 3)
+        self.assertTrue(all(type(i) is Item for i in s))
+        self.assertEqual(s.frames(), [1, 5, 7])
+        self.assertEqual(s.format('%R'), '[1, 5, 7]')
+        self.assertEqual(s.missing(), [2, 3, 4, 6])
+        s[::2] = ["file.009.ext", "file.011.ext"]
+        self.assertEqual(s.frames(), [5, 9, 11])
+        self.assertRaises(SequenceError, s.__setitem__, slice(0, 1),
+                          ["item.001.ext"])
+        self.assertEqual(s.frames(), [5, 9, 11])
+
     def test_insert(self):
         s = Sequence(["file.001.ext"])
         s.insert(0, "file.002.ext")
@@ -334,6 +509,71 @@ class SequenceTestCase(unittest.TestCase):
         self.assertFalse(seq.contains('file.0009.jpg'))
         self.assertFalse(seq.contains('file.0009.pic'))
 
+    def test_frames_are_updated_as_items_change(self):
+        """testing if the frames, FrameSet and frame lookup are kept up to
+        date by append, insert, __setitem__ and pop
+        """
+        seq = Sequence(['a.0001.exr', 'a.0002.exr', 'a.0005.exr'])
+        self.assertEqual(seq.frames(), [1, 2, 5])
+        self.assertEqual(seq.missing(), [3, 4])
+        seq.append('a.0007.exr')
+        seq.insert(0, 'a.0000.exr')
+        self.assertEqual(seq.frames(), [0, 1, 2, 5, 7])
+        self.assertEqual(seq.frameset().ranges(), [(0, 2), (5, 5), (7, 7)])
+        self.assertEqual(seq.missing(), [3, 4, 6])
+        self.assertEqual(seq.find(5).name, 'a.0005.exr')
+        self.assertEqual(seq.find(4), None)
+        self.assertTrue('a.0005.exr' in seq)
+        self.assertFalse('a.0004.exr' in seq)
+        self.assertFalse('b.0005.exr' in seq)
+
+        seq[1] = 'a.0010.exr'
+        self.assertEqual(seq.frames(), [0, 2, 5, 7, 10])
+        self.assertEqual(seq.find(1), None)
+        self.assertEqual(seq.end(), 10)
+        seq.pop()
+        self.assertEqual(seq.frameset().ranges(), [(0, 0), (2, 2), (5, 5),
+                                                   (10, 10)])
+
+    def test_missing_is_built_from_gaps(self):
+        """testing if missing frames are kept as ranges, so a sequence with
+        a huge gap does not list every missing frame unless asked
+        """
+        seq = Sequence(['a.000000001.exr', 'a.000000003.exr',
+                        'a.100000000.exr'])
+        missing = seq.missing()
+        self.assertEqual(missing.ranges(), [(2, 2), (4, 99999999)])
+        self.assertEqual(len(missing), 99999997)
+        self.assertEqual(missing[:3], [2, 4, 5])
+        self.assertEqual(seq.format('%M'), '[2, 4-99999999]')
+
+        seq = Sequence(['a.%04d.exr' % i for i in (1, 2, 5, 8)])
+        self.assertEqual(seq.missing(), [3, 4, 6, 7])
+        self.assertEqual(seq.missing(expand=True), [3, 4, 6, 7])
+        self.assertEqual(seq.format('%m'), str([3, 4, 6, 7]))
+
+    def test_frame_set_algebra(self):
+        """testing if union, intersection, difference, symmetric_difference
+        and issubset work on the frames of matching sequences
+        """
+        a = uncompress('a.%04d.exr 1-10', fmt='%h%p%t %r')
+        b = Sequence(['a.%04d.exr' % i for i in (5, 6, 7, 12, 20)])
+        fmt = '%h%p%t %R'
+        self.assertEqual(a.union(b).format(fmt), 'a.%04d.exr [1-10, 12, 20]')
+        self.assertEqual(a.intersection(b).format(fmt), 'a.%04d.exr [5-7]')
+        self.assertEqual(a.difference(b).format(fmt),
+                         'a.%04d.exr [1-4, 8-10]')
+        self.assertEqual(b.symmetric_difference(a).format(fmt),
+                         'a.%04d.exr [1-4, 8-10, 12, 20]')
+        self.assertFalse(b.issubset(a))
+        self.assertTrue(a.intersection(b).issubset(b))
+        self.assertEqual(a.difference(a).length(), 0)
+        self.assertEqual(a.intersection(b)[0].name, 'a.0005.exr')
+
+        c = uncompress('b.%04d.exr 1-10', fmt='%h%p%t %r')
+        self.assertRaises(SequenceError, a.union, c)
+        self.assertRaises(SequenceError, Sequence(['a.0001.exr']).union, a)
+
     def test_format_is_working_properly_1(self):
         """testing if format is working properly
         """
@@ -369,6 +609,21 @@ class SequenceTestCase(unittest.TestCase):
             'file.%04d.jpg 1-10 (missing [4-5, 7-9])'
         )
 
+    def test_frames_are_updated_after_changes(self):
+        """testing if the cached frames follow changes to the sequence
+        """
+        seq = Sequence(self.files)
+        self.assertEqual(seq.frames(), [1, 2, 3])
+        self.assertEqual(seq.format('%R'), '[1-3]')
+        seq.append('file.0006.jpg')
+        self.assertEqual(seq.frames(), [1, 2, 3, 6])
+        self.assertEqual(seq.missing(), [4, 5])
+        seq.pop(1)
+        self.assertEqual(seq.frames(), [1, 3, 6])
+        self.assertEqual(seq.format('%s %e %R %M'), '1 6 [1, 3, 6] [2, 4-5]')
+        del seq[0]
+        self.assertEqual(seq.start(), 3)
+
     def test_format_directory_attribute(self):
         dir_name = os.path.dirname(
             os.path.abspath(self.files[0])) + os.sep
@@ -378,6 +633,23 @@ class SequenceTestCase(unittest.TestCase):
             dir_name
             )
 
+    def test_format_keeps_literal_text(self):
+        """testing if format only replaces the directives, and formats a
+        list of sequences with write_sequences
+        """
+        seq = Sequence(self.files)
+        self.assertEqual(seq.format('shot %h, 100%% of %l'),
+                         'shot file., 100% of 3')
+        self.assertRaises(pyseq.FormatError, seq.format, '%h %x')
+
+        try:
+            from StringIO import StringIO
+        except ImportError:
+            from io import StringIO
+        stream = StringIO()
+        pyseq.write_sequences([seq, Sequence(['a.1.exr'])], stream, '%h%r%t')
+        self.assertEqual(stream.getvalue(), 'file.1-3.jpg\na.1.exr\n')
+
     def test__get_missing(self):
         """ test that _get_missing works
         """
@@ -414,6 +686,70 @@ class SequenceTestCase(unittest.TestCase):
             missing.pop(-1)
         self.assertEqual(seq._get_missing(), missing)
 
+class SequenceIndexTestCase(unittest.TestCase):
+    """tests the SequenceIndex class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        self.here = os.path.dirname(os.path.abspath(__file__))
+        self.files = os.path.join(self.here, 'files')
+
+    def formatted(self, seqs):
+        return [s.format('%h%p%t %R') for s in seqs]
+
+    def test_matches_get_sequences(self):
+        """testing if an index of a directory has the same sequences as
+        get_sequences, also after files are removed
+        """
+        index = SequenceIndex(self.files)
+        self.assertEqual(self.formatted(get_sequences(self.files)),
+                         self.formatted(index.sequences()))
+
+        names = sorted(os.path.join(self.files, x)
+                       for x in os.listdir(self.files))
+        removed = [x for x in names[::3] if os.path.basename(x)[:2] in
+                   ('01', 'a.', 'fi')]
+        for name in removed:
+            index.remove(name)
+        rest = [x for x in names if x not in removed]
+        self.assertEqual(self.formatted(get_sequences(rest)),
+                         self.formatted(index.sequences()))
+
+    def test_add_remove_and_rename(self):
+        """testing if add, remove and rename update the sequences
+        """
+        index = SequenceIndex(['r/a.%04d.exr' % i for i in (1, 2, 3, 5)])
+        seq = index.find('r/a.0001.exr')
+        self.assertEqual(seq.format('%R'), '[1-3, 5]')
+
+        self.assertTrue(index.add('r/a.0004.exr') is seq)
+        self.assertEqual(seq.format('%R'), '[1-5]')
+        self.assertEqual(seq.frames(), [1, 2, 3, 4, 5])
+
+        self.assertTrue(index.remove('r/a.0003.exr') is seq)
+        self.assertEqual(seq.format('%R'), '[1-2, 4-5]')
+        self.assertFalse('r/a.0003.exr' in index)
+        self.assertRaises(ValueError, index.remove, 'r/a.0003.exr')
+
+        index.rename('r/a.0005.exr', 'r/a.0003.exr')
+        self.assertEqual(seq.format('%R'), '[1-4]')
+
+        # a sequence of a single file is not a sequence anymore
+        for i in (1, 2, 3):
+            index.remove('r/a.%04d.exr' % i)
+        self.assertEqual([str(s) for s in index], ['a.0004.exr'])
+        self.assertEqual(index.find('r/a.0004.exr').frames(), [])
+        self.assertEqual(str(seq), 'a.0004.exr')
+
+        index.add('r/b.0001.exr')
+        index.add('r/a.0010.exr')
+        self.assertEqual(self.formatted(index),
+                         ['a.%04d.exr [4, 10]', 'b.0001.exr '])
+        self.assertEqual(len(index), 2)
+
+
 class HelperFunctionsTestCase(unittest.TestCase):
     """tests the helper functions like
     pyseq.diff()
@@ -560,6 +896,84 @@ class HelperFunctionsTestCase(unittest.TestCase):
             len(seq8)
         )
 
+    def test_uncompress_is_working_properly_9(self):
+        """testing if uncompress parses frame lists without evaluating
+        them and builds the items with their frames
+        """
+        seq9 = uncompress('a.%04d.tga [1, 2, 7]', fmt='%h%p%t %f')
+        self.assertEqual('a.%04d.tga [1-2, 7]', seq9.format('%h%p%t %R'))
+        self.assertEqual([1, 2, 7], [item.frame for item in seq9])
+        self.assertEqual('a.0007.tga', seq9[-1].name)
+
+        seq9 = uncompress('a.%04d.tga 1-5 ([__import__("os")])',
+                          fmt='%h%p%t %r (%m)')
+        self.assertEqual('a.%04d.tga [1-5]', seq9.format('%h%p%t %R'))
+
+        # %f overrides %R, and a non-empty %m overrides %f
+        seq9 = uncompress('a.%04d.tga [1-3] [1, 2, 3, 10]', fmt='%h%p%t %R %f')
+        self.assertEqual('a.%04d.tga [1-3, 10]', seq9.format('%h%p%t %R'))
+        seq9 = uncompress('a.%04d.tga 1-6 [1, 2, 3] [4]',
+                          fmt='%h%p%t %r %f %m')
+        self.assertEqual('a.%04d.tga [1-3, 5-6]', seq9.format('%h%p%t %R'))
+        seq9 = uncompress('a.%04d.tga 1-6 [1, 2, 3] []',
+                          fmt='%h%p%t %r %f %m')
+        self.assertEqual('a.%04d.tga [1-3]', seq9.format('%h%p%t %R'))
+
+    def test_uncompress_is_working_properly_10(self):
+        """testing if uncompress returns a virtual sequence that creates its
+        items on demand
+        """
+        seq10 = uncompress('/r/a.%08d.exr 1-5000000', fmt='%h%p%t %r',
+                           virtual=True)
+        self.assertTrue(isinstance(seq10, pyseq.VirtualSequence))
+        self.assertEqual(5000000, len(seq10))
+        self.assertEqual('a.1-5000000.exr', str(seq10))
+        self.assertEqual('a.%08d.exr', seq10.format('%h%p%t'))
+        self.assertEqual('/r/a.05000000.exr', seq10[-1].path)
+        self.assertEqual(1235, seq10[1234].frame)
+        self.assertTrue('/r/a.00001234.exr' in seq10)
+        self.assertFalse('/r/a.1234.exr' in seq10)
+        self.assertFalse('/s/a.00001234.exr' in seq10)
+
+        seq10.remove('/r/a.00000005.exr')
+        self.assertFalse('/r/a.00000005.exr' in seq10)
+        self.assertEqual('[1-4, 6-5000000]', seq10.format('%R'))
+        self.assertRaises(SequenceError, seq10.append, '/r/b.00000005.exr')
+
+        seq = uncompress('a.%04d.tga 1-5 (missing [3])',
+                         fmt='%h%p%t %r (missing %m)')
+        seq10 = uncompress('a.%04d.tga 1-5 (missing [3])',
+                           fmt='%h%p%t %r (missing %m)', virtual=True)
+        self.assertEqual(seq, seq10)
+        self.assertEqual([x.frame for x in seq], [x.frame for x in seq10])
+
+    def test_virtual_sequence_list_methods(self):
+        """testing if the list methods of a virtual sequence work on its
+        frames instead of the empty list it inherits from
+        """
+        seq = uncompress('/r/a.%04d.exr [1-3, 7]', fmt='%h%p%t %R',
+                         virtual=True)
+        self.assertEqual(seq.index('/r/a.0007.exr'), 3)
+        self.assertRaises(ValueError, seq.index, '/r/a.0005.exr')
+        self.assertRaises(ValueError, seq.index, '/r/a.0001.exr', 1)
+        self.assertEqual(seq.count('/r/a.0002.exr'), 1)
+        self.assertEqual(seq.count('/r/a.0005.exr'), 0)
+        self.assertEqual(len(seq * 2), 8)
+        seq.sort()
+        self.assertRaises(TypeError, seq.sort, reverse=True)
+        self.assertRaises(TypeError, seq.reverse)
+
+        copy = seq.copy()
+        copy.clear()
+        self.assertEqual(len(copy), 0)
+        self.assertEqual(seq.format('%R'), '[1-3, 7]')
+
+        self.assertRaises(SequenceError, seq.reIndex, 1, '%d', 2, '/r/j')
+        copy = seq.copy()
+        while copy:
+            copy.pop()
+        self.assertEqual(len(copy), 0)
+
     def test_get_sequences_is_working_properly_1(self):
         """testing if get_sequences is working properly
         """
@@ -623,6 +1037,718 @@ class HelperFunctionsTestCase(unittest.TestCase):
                 seq.format('%h%p%t %r')
             )
 
+    def test_exists_checks_the_disk(self):
+        """testing if Item.exists reports a file deleted after it was listed
+        """
+        top = tempfile.mkdtemp()
+        try:
+            open(os.path.join(top, 'a.0001.exr'), 'w').close()
+            item = pyseq.listdir(top)[0]
+            seq = get_sequences([item])
+            self.assertTrue(seq[0][0].exists)
+            os.remove(os.path.join(top, 'a.0001.exr'))
+            self.assertFalse(seq[0][0].exists)
+            self.assertFalse(Item(item).exists)
+        finally:
+            shutil.rmtree(top)
+
+    def test_get_sequences_from_dir_entries(self):
+        """testing if get_sequences accepts os.DirEntry objects and reuses
+        their stat results for size and mtime
+        """
+        if pyseq.scandir is None:
+            self.skipTest('scandir is not available')
+        entries = [e for e in pyseq.scandir(files_dir)
+                   if not e.name.startswith('.')]
+        seqs = get_sequences(entries)
+        self.assertEqual(
+            [str(s) for s in get_sequences(files_dir)],
+            [str(s) for s in seqs]
+        )
+        seq = seqs[0]
+        self.assertEqual(
+            seq[0].path,
+            os.path.join(files_dir, '012_vb_110_v001.0001.png')
+        )
+
+        def no_stat(*args, **kwargs):
+            raise AssertionError('os.stat should not be called')
+
+        stat = os.stat
+        os.stat = no_stat
+        try:
+            self.assertEqual(seq.size, 0)
+            self.assertTrue(seq.mtime > 0)
+        finally:
+            os.stat = stat
+        self.assertTrue(seq[0].exists)
+
+    def test_stat_sequences(self):
+        """testing if stat_sequences stores the stat results on the items
+        and the size and mtime of sequences are computed once
+        """
+        top = tempfile.mkdtemp()
+        try:
+            for i in range(1, 21):
+                with open(os.path.join(top, 'a.%04d.exr' % i), 'w') as f:
+                    f.write('x' * i)
+            seqs = get_sequences(top)
+            pyseq.stat_sequences(seqs, jobs=4)
+            self.assertTrue(all(item._has_stat() for item in seqs[0]))
+
+            stat = os.stat
+            try:
+                def fail(path):
+                    raise AssertionError('%s was stat\'ed again' % path)
+                os.stat = fail
+                self.assertEqual(seqs[0].size, sum(range(1, 21)))
+                self.assertEqual(seqs[0].format('%d'), str(sum(range(1, 21))))
+                self.assertTrue(seqs[0].mtime > 0)
+            finally:
+                os.stat = stat
+
+            os.remove(seqs[0][0].path)
+            seqs = get_sequences(top)
+            os.remove(seqs[0][0].path)
+            pyseq.stat_sequences(seqs)
+            self.assertRaises(OSError, lambda: seqs[0].size)
+
+            # a few items are stat'ed without starting threads
+            items = [Item(os.path.join(top, 'a.%04d.exr' % i))
+                     for i in (3, 4, 5)]
+            thread = threading.Thread
+            try:
+                def fail(*args, **kwargs):
+                    raise AssertionError('a thread was started')
+                threading.Thread = fail
+                pyseq.stat_items(items)
+            finally:
+                threading.Thread = thread
+            self.assertTrue(all(item._has_stat() for item in items))
+        finally:
+            shutil.rmtree(top)
+
+    def test_walk(self):
+        """testing if walk finds the sequences in each directory
+        """
+        results = list(pyseq.walk(files_dir))
+        self.assertEqual(len(results), 1)
+        root, dirs, seqs = results[0]
+        self.assertEqual(root, files_dir)
+        self.assertEqual(dirs, [])
+        self.assertEqual(
+            [str(s) for s in get_sequences(files_dir)],
+            [str(s) for s in seqs]
+        )
+
+    def test_walk_with_jobs(self):
+        """testing if the threaded walk yields the same results as the
+        serial walk, in the same order unless ordered is False
+        """
+        def flatten(results):
+            return [(root, dirs, [str(s) for s in seqs])
+                    for root, dirs, seqs in results]
+
+        top = tempfile.mkdtemp()
+        try:
+            for d in ('a', 'a/b', 'a/c', 'd'):
+                os.mkdir(os.path.join(top, d))
+                for i in range(1, 4):
+                    open(os.path.join(top, d, 'x.%04d.exr' % i), 'w').close()
+
+            for topdown in (True, False):
+                for level in (-1, 2):
+                    serial = flatten(pyseq.walk(top, level, topdown))
+                    self.assertEqual(
+                        serial,
+                        flatten(pyseq.walk(top, level, topdown, jobs=4))
+                    )
+                    self.assertEqual(
+                        sorted(serial),
+                        sorted(flatten(pyseq.walk(top, level, topdown,
+                                                  jobs=4, ordered=False)))
+                    )
+
+            # dirs removed by the caller are not descended into
+            roots = []
+            for root, dirs, seqs in pyseq.walk(top, jobs=4, ordered=False):
+                roots.append(root)
+                dirs[:] = [d for d in dirs if d != 'a']
+            self.assertEqual(sorted(roots), [top, os.path.join(top, 'd')])
+        finally:
+            shutil.rmtree(top)
+
+    def test_walk_with_jobs_is_bounded(self):
+        """testing if the threaded walk only lists a bounded number of
+        directories ahead of the caller
+        """
+        top = tempfile.mkdtemp()
+        try:
+            for i in range(20):
+                for j in range(3):
+                    os.makedirs(os.path.join(top, 'd%02d' % i, 's%d' % j))
+            limit = 2 * pyseq.walk_read_ahead
+            pyseq.stats.reset()
+            pyseq.stats.enable()
+            for topdown in (True, False):
+                for ordered in (True, False):
+                    pyseq.stats.reset()
+                    walker = pyseq.walk(top, topdown=topdown, jobs=2,
+                                        ordered=ordered)
+                    next(walker)
+                    next(walker)
+                    time.sleep(0.1)
+                    # bottom-up walks also list the parents of the leaves
+                    # they yield first
+                    self.assertTrue(
+                        pyseq.stats.counters['dirs'] <= 3 * limit,
+                        pyseq.stats.counters)
+                    self.assertEqual(len(list(walker)), 79)
+                    self.assertEqual(pyseq.stats.counters['dirs'], 81)
+        finally:
+            pyseq.stats.disable()
+            pyseq.stats.reset()
+            shutil.rmtree(top)
+
+    def test_walk_with_cache(self):
+        """testing if walk serves unchanged directories from a ScanCache and
+        lists changed ones again
+        """
+        top = tempfile.mkdtemp()
+        cache_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(top, 'a'))
+            for i in (1, 2, 3, 5):
+                open(os.path.join(top, 'a', 'x.%04d.exr' % i), 'w').close()
+            open(os.path.join(top, 'a', 'y.exr'), 'w').close()
+            past = time.time() - 60
+            for d in (top, os.path.join(top, 'a')):
+                os.utime(d, (past, past))
+
+            cache = pyseq.ScanCache(cache_dir, max_entries=10)
+
+            def flatten(**kwargs):
+                return [(root, dirs, [s.format('%h%p%t %R') for s in seqs],
+                         [s.frames() for s in seqs])
+                        for root, dirs, seqs in pyseq.walk(top, **kwargs)]
+
+            expected = flatten(cache=False)
+            self.assertEqual(expected, flatten(cache=cache))
+            self.assertEqual(len(cache), 2)
+            # listings are stored as plain JSON, not pickles
+            import sqlite3
+            db = sqlite3.connect(cache.path)
+            for row in db.execute('SELECT data FROM dirs'):
+                self.assertEqual(len(json.loads(bytes(row[0]).decode())), 3)
+            db.close()
+
+            scan_dir = pyseq._scan_dir
+            scanned = []
+            pyseq._scan_dir = lambda path: scanned.append(path) or \
+                scan_dir(path)
+            try:
+                self.assertEqual(expected, flatten(cache=cache))
+                self.assertEqual(expected, flatten(cache=cache, jobs=2))
+                self.assertEqual(scanned, [])
+
+                open(os.path.join(top, 'a', 'x.0004.exr'), 'w').close()
+                os.utime(os.path.join(top, 'a'), (past + 1, past + 1))
+                results = flatten(cache=cache)
+                self.assertEqual(scanned, [os.path.join(top, 'a')])
+                self.assertEqual(results[1][2], ['x.%04d.exr [1-5]', 'y.exr '])
+            finally:
+                pyseq._scan_dir = scan_dir
+
+            cache.max_entries = 1
+            cache.flush()
+            list(pyseq.walk(top, cache=cache, hidden=True))
+            self.assertEqual(len(cache), 1)
+            cache.close()
+
+            # $PYSEQ_CACHE_DIR is only used with cache=True
+            env_dir = os.path.join(cache_dir, 'env')
+            os.environ['PYSEQ_CACHE_DIR'] = env_dir
+            try:
+                expected = flatten(cache=False)
+                self.assertEqual(expected, flatten())
+                self.assertFalse(os.path.exists(env_dir))
+                self.assertEqual(expected, flatten(cache=True))
+                self.assertEqual(len(pyseq.ScanCache(env_dir)), 2)
+            finally:
+                del os.environ['PYSEQ_CACHE_DIR']
+        finally:
+            shutil.rmtree(top)
+            shutil.rmtree(cache_dir)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'requires inotify')
+    def test_watch(self):
+        """testing if watch reports the changes to the sequences as files
+        are written, linked and deleted
+        """
+        top = tempfile.mkdtemp()
+        try:
+            for i in (1, 2, 3):
+                open(os.path.join(top, 'a.%04d.exr' % i), 'w').close()
+
+            events = []
+            ready = threading.Event()
+            done = threading.Event()
+
+            def callback(event, seq, frames):
+                if seq.format('%h%p%t') == 'ready':
+                    ready.set()
+                    return
+                events.append((event, seq, frames))
+                if len(events) == 9:
+                    done.set()
+                    return False
+
+            thread = threading.Thread(target=pyseq.watch,
+                                      args=(top, callback),
+                                      kwargs={'timeout': 10})
+            thread.daemon = True
+            thread.start()
+            # the watch is set up once it reports a file written to, or
+            # removed from, top
+            sentinel = os.path.join(top, 'ready')
+            for _ in range(200):
+                if os.path.exists(sentinel):
+                    os.remove(sentinel)
+                else:
+                    open(sentinel, 'w').close()
+                if ready.wait(0.05):
+                    break
+            self.assertTrue(ready.is_set())
+
+            for i in (4, 6, 5):
+                open(os.path.join(top, 'a.%04d.exr' % i), 'w').close()
+            os.remove(os.path.join(top, 'a.0002.exr'))
+            open(os.path.join(top, 'a.0007.exr'), 'w').close()
+            os.symlink(os.path.join(top, 'a.0001.exr'),
+                       os.path.join(top, 'a.0008.exr'))
+            self.assertTrue(done.wait(10))
+            thread.join(10)
+
+            self.assertEqual(
+                [(event, frames) for event, seq, frames in events],
+                [('appended', [4]), ('appended', [6]), ('missing', [5]),
+                 ('appended', [5]), ('complete', []), ('removed', [2]),
+                 ('missing', [2]), ('appended', [7]), ('appended', [8])]
+            )
+            self.assertEqual(events[-1][1].format('%h%p%t %R'),
+                             'a.%04d.exr [1, 3-8]')
+        finally:
+            shutil.rmtree(top)
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'requires inotify')
+    def test_watch_resync(self):
+        """testing if the watcher walks the tree again after lost events,
+        watching new directories and dropping removed ones
+        """
+        top = tempfile.mkdtemp()
+        try:
+            for d in ('a', 'b'):
+                os.mkdir(os.path.join(top, d))
+                for i in (1, 2):
+                    open(os.path.join(top, d, 'x.%04d.exr' % i), 'w').close()
+            watcher = pyseq._Watcher(top)
+            try:
+                shutil.rmtree(os.path.join(top, 'b'))
+                os.makedirs(os.path.join(top, 'c', 'd'))
+                for i in (1, 2):
+                    open(os.path.join(top, 'c', 'd', 'y.%04d.exr' % i),
+                         'w').close()
+                open(os.path.join(top, 'a', 'x.0003.exr'), 'w').close()
+                watcher.resync()
+                self.assertEqual(
+                    sorted(watcher.dirs),
+                    [top] + [os.path.join(top, d) for d in ('a', 'c', 'c/d')]
+                )
+                self.assertEqual(
+                    sorted((event, s.format('%h%p%t'), frames)
+                           for event, s, frames in watcher.pending),
+                    [('appended', 'x.%04d.exr', [3]),
+                     ('created', 'y.%04d.exr', [1, 2]),
+                     ('deleted', 'x.%04d.exr', [1, 2])]
+                )
+                del watcher.pending[:]
+                # files in the new directories are reported
+                open(os.path.join(top, 'c', 'd', 'y.0003.exr'), 'w').close()
+                events = []
+                while not events:
+                    events = [(event, frames) for event, s, frames
+                              in watcher.read(5)
+                              if s.format('%h%p%t') == 'y.%04d.exr']
+                self.assertEqual(events, [('appended', [3])])
+            finally:
+                watcher.close()
+        finally:
+            shutil.rmtree(top)
+
+    def test_get_sequences_with_workers(self):
+        """testing if get_sequences grouping on worker processes returns the
+        same sequences and items as grouping in one process
+        """
+        def dump(seqs):
+            return [(str(s), [(i.path, i.frame, i.head, i.tail, i.pad)
+                              for i in s]) for s in seqs]
+
+        names = os.listdir(files_dir) + \
+            ['p.%d.dpx' % i for i in (1, 8, 10, 11)] + ['p.09.dpx']
+        self.assertEqual(dump(get_sequences(names, workers=2)),
+                         dump(get_sequences(names)))
+        strict_pad = pyseq.strict_pad
+        try:
+            pyseq.strict_pad = False
+            seqs = get_sequences(names)
+            self.assertEqual(dump(get_sequences(names, workers=3)),
+                             dump(seqs))
+            self.assertTrue(all(i.tail == '.dpx' for s in seqs for i in s
+                                if i.name.startswith('p.')))
+        finally:
+            pyseq.strict_pad = strict_pad
+
+    def test_iget_sequences_with_chunk_size(self):
+        """testing if iget_sequences sorting in chunks spilled to temporary
+        files yields the same sequences as sorting in memory, from any
+        iterable of names
+        """
+        names = sorted(os.listdir(files_dir))
+        expected = [str(s) for s in pyseq.iget_sequences(names)]
+        self.assertEqual(
+            [str(s) for s in pyseq.iget_sequences(iter(names), chunk_size=7)],
+            expected
+        )
+        lines = (name + '\n' for name in reversed(names))
+        self.assertEqual(
+            [str(s) for s in pyseq.iget_sequences(lines, chunk_size=1000)],
+            expected
+        )
+        self.assertRaises(TypeError, list, pyseq.iget_sequences(iter(names)))
+
+        # names with the same sort key keep their input order, and items
+        # keep their type
+        names = ['B.%04d.exr' % i for i in range(1, 4)] + \
+            ['b.%04d.exr' % i for i in range(1, 4)] + ['b.1.exr', 'B.1.exr']
+        random.shuffle(names)
+        items = [Item(name) for name in names]
+
+        def dump(seqs):
+            return [[(i.name, i.item) for i in s] for s in seqs]
+
+        for source in (names, items):
+            expected = dump(pyseq.iget_sequences(source))
+            for chunk_size in (2, 1000):
+                self.assertEqual(
+                    dump(pyseq.iget_sequences(iter(source),
+                                              chunk_size=chunk_size)),
+                    expected
+                )
+        self.assertTrue(all(type(i.item) is Item and i.item in items
+                            for s in pyseq.iget_sequences(iter(items), 2)
+                            for i in s))
+
+    def test_stats(self):
+        """testing if stats counts and times the work done only while it is
+        enabled, and calls its hooks
+        """
+        events = []
+        hook = lambda *x: events.append(x)
+        pyseq.stats.reset()
+        pyseq.stats.add_hook(hook)
+        try:
+            get_sequences(files_dir)
+            self.assertEqual(pyseq.stats.counters, {})
+
+            pyseq.stats.enable()
+            seqs = get_sequences(files_dir)
+            seqs[0].format('%h%r%t')
+            counters = pyseq.stats.counters
+            self.assertTrue(counters['items'] >= len(os.listdir(files_dir)))
+            self.assertEqual(counters['dirs'], 1)
+            self.assertEqual(sorted(pyseq.stats.timings),
+                             ['format', 'group', 'list', 'sort'])
+            self.assertTrue(('count', 'dirs', 1) in events)
+            self.assertTrue('items' in pyseq.stats.report())
+        finally:
+            pyseq.stats.disable()
+            pyseq.stats.reset()
+            pyseq.stats.remove_hook(hook)
+
+    def test_reindex(self):
+        """testing if reIndex renames overlapping frames, refuses to
+        overwrite files and can resume or roll back from its journal
+        """
+        top = tempfile.mkdtemp()
+        try:
+            for i in range(1, 6):
+                open(os.path.join(top, 'a.%04d.exr' % i), 'w').close()
+            seq = pyseq.get_sequences(top)[0]
+            seq.reIndex(2, jobs=3)
+            self.assertEqual(seq.format('%h%p%t %R'), 'a.%04d.exr [3-7]')
+            self.assertEqual(sorted(os.listdir(top)),
+                             ['a.%04d.exr' % i for i in range(3, 8)])
+            self.assertEqual(seq[0].path, os.path.join(top, 'a.0003.exr'))
+
+            seq.reIndex(-2, padding='%d')
+            self.assertEqual(seq.format('%h%p%t %R'), 'a.%d.exr [1-5]')
+
+            single = pyseq.Sequence([os.path.join(top, 'a.0001.exr')])
+            single.reIndex(5)
+            self.assertEqual(str(single), 'a.0001.exr')
+
+            open(os.path.join(top, 'a.6.exr'), 'w').close()
+            self.assertRaises(SequenceError, seq.reIndex, 2)
+            self.assertEqual(len(os.listdir(top)), 6)
+            os.remove(os.path.join(top, 'a.6.exr'))
+
+            renames = [(i.path, os.path.join(top, 'b.%d.exr' % i.frame))
+                       for i in seq]
+            journal = os.path.join(top, 'journal')
+            steps, waves = pyseq._rename_plan(renames)
+            pyseq._write_journal(journal, steps, waves)
+            with open(journal, 'a') as f:
+                pyseq._rename_wave(steps, waves[0][:2], set(), f)
+            pyseq.rollback_reindex(journal)
+            self.assertEqual(sorted(os.listdir(top)),
+                             ['a.%d.exr' % i for i in range(1, 6)])
+
+            pyseq._write_journal(journal, steps, waves)
+            with open(journal, 'a') as f:
+                pyseq._rename_wave(steps, waves[0][:2], set(), f)
+            pyseq.resume_reindex(journal)
+            self.assertEqual(sorted(os.listdir(top)),
+                             ['b.%d.exr' % i for i in range(1, 6)])
+        finally:
+            shutil.rmtree(top)
+
+    def test_diff_snapshots(self):
+        """testing if diff_snapshots reports the sequences and frames that
+        changed between two snapshots, including one saved to a file
+        """
+        top = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(top, 'sub'))
+            for i in range(1, 6):
+                with open(os.path.join(top, 'a.%04d.exr' % i), 'w') as f:
+                    f.write('x')
+            with open(os.path.join(top, 'sub', 'notes.txt'), 'w') as f:
+                f.write('x')
+            path = os.path.join(top, 'snap.json')
+            pyseq.snapshot(top).save(path)
+            old = pyseq.Snapshot.load(path)
+            self.assertEqual(len(old), 2)
+
+            os.remove(os.path.join(top, 'a.0003.exr'))
+            open(os.path.join(top, 'a.0009.exr'), 'w').close()
+            with open(os.path.join(top, 'sub', 'notes.txt'), 'a') as f:
+                f.write('more')
+            os.remove(path)
+            new = pyseq.snapshot(top)
+
+            self.assertEqual(
+                [(e, p, f.ranges()) for e, p, f in
+                 pyseq.diff_snapshots(old, new)],
+                [('appended', os.path.join(top, 'a.%04d.exr'), [(9, 9)]),
+                 ('removed', os.path.join(top, 'a.%04d.exr'), [(3, 3)]),
+                 ('modified', os.path.join(top, 'sub', 'notes.txt'), [])]
+            )
+            self.assertEqual(
+                [(e, f.ranges()) for e, p, f in
+                 pyseq.diff_snapshots(new, pyseq.Snapshot())],
+                [('deleted', [(1, 2), (4, 5), (9, 9)]), ('deleted', [])]
+            )
+            self.assertEqual(pyseq.diff_snapshots(new, new), [])
+
+            # empty sequences are skipped
+            new.add(pyseq.VirtualSequence('b.', '%04d', '.exr', FrameSet(),
+                                          top))
+            seq = Sequence([os.path.join(top, 'c.0001.exr')])
+            seq.pop()
+            new.add(seq)
+            self.assertEqual(len(new), 2)
+        finally:
+            shutil.rmtree(top)
+
+    def test_dump_and_load(self):
+        """testing if a manifest written by dump loads the same sequences,
+        with the sizes and mtimes that were stored
+        """
+        top = tempfile.mkdtemp()
+        try:
+            path = os.path.join(top, 'files.pyseq')
+            seqs = get_sequences(files_dir)
+            pyseq.dump(seqs, path, stat=True)
+            with pyseq.load(path) as manifest:
+                self.assertEqual(len(manifest), len(seqs))
+                fmt = '%D%h%p%t %R %l %d'
+                self.assertEqual([s.format(fmt) for s in manifest],
+                                 [s.format(fmt) for s in seqs])
+                self.assertTrue(manifest[0] is manifest[0])
+                self.assertEqual([i.mtime for i in manifest[-1]],
+                                 [i.mtime for i in seqs[-1]])
+
+            for i in (1, 2, 3, 5):
+                with open(os.path.join(top, 'a.%04d.exr' % i), 'w') as f:
+                    f.write('x' * i)
+            pyseq.dump(get_sequences(top), path, stat=True)
+            for i in (1, 2, 3, 5):
+                os.remove(os.path.join(top, 'a.%04d.exr' % i))
+            manifest = pyseq.load(path)
+            seq = manifest[0]
+            self.assertEqual(seq.format('%h%p%t %R'), 'a.%04d.exr [1-3, 5]')
+            self.assertEqual(seq.size, 11)
+            self.assertEqual(seq.find(5).size, 5)
+            manifest.close()
+            self.assertEqual(seq.frameset().ranges(), [(1, 3), (5, 5)])
+            self.assertRaises(SequenceError, lambda: seq[0])
+            self.assertRaises(SequenceError, lambda: seq.size)
+            self.assertRaises(SequenceError, lambda: manifest[1])
+
+            # a sequence without frames has no size or mtime
+            empty = pyseq.VirtualSequence('a.', '%04d', '.exr', FrameSet(),
+                                          top)
+            pyseq.dump([empty], path, stat=True)
+            with pyseq.load(path) as manifest:
+                self.assertEqual(len(manifest[0]), 0)
+                self.assertEqual(manifest[0].size, 0)
+                self.assertEqual(manifest[0].mtime, None)
+
+            pyseq.dump(seqs, path)
+            self.assertEqual(pyseq.load(path).flags, 0)
+            with open(path, 'wb') as f:
+                f.write(b'not a manifest')
+            self.assertRaises(SequenceError, pyseq.load, path)
+        finally:
+            shutil.rmtree(top)
+
+    def test_get_sequences_matches_reference_grouping(self):
+        """testing if get_sequences groups random names exactly like the
+        original item by item comparison does, with and without strict_pad
+        """
+        def reference(source):
+            seqs = []
+            for item in sorted(source, key=lambda x: str(x)):
+                item = Item(item)
+                for seq in seqs[::-1]:
+                    if seq.includes(item):
+                        seq.append(item)
+                        break
+                else:
+                    seqs.append(Sequence([item]))
+            return seqs
+
+        def dump(seqs):
+            return [
+                [(i.path, i.frame, i.head, i.tail, i.pad) for i in seq]
+                for seq in seqs
+            ]
+
+        rand = random.Random(41)
+        for strict in (True, False):
+            pyseq.strict_pad = strict
+            try:
+                for _ in range(100):
+                    names = []
+                    for _ in range(rand.randint(1, 40)):
+                        name = rand.choice(['', 'a', 'b_'])
+                        for _ in range(rand.randint(0, 3)):
+                            name += '%0*d' % (rand.randint(1, 3),
+                                              rand.randint(0, 12))
+                            name += rand.choice(['.', '_x', 'v'])
+                        names.append(os.path.join(
+                            rand.choice(['d1', 'd2']), name + 'ext'))
+                    self.assertEqual(
+                        dump(reference(names)),
+                        dump(get_sequences(names))
+                    )
+            finally:
+                pyseq.strict_pad = True
+
+
+@unittest.skipIf(pyseq.aio is None, 'requires asyncio')
+class AioTestCase(unittest.TestCase):
+    """Tests the asyncio API
+    """
+
+    def collect(self, iterator):
+        """runs an async iterator to the end on a new event loop and returns
+        what it yielded
+        """
+        import asyncio
+        loop = asyncio.new_event_loop()
+        results = []
+        try:
+            while True:
+                try:
+                    results.append(
+                        loop.run_until_complete(iterator.__anext__()))
+                except StopAsyncIteration:
+                    return results
+        finally:
+            loop.close()
+
+    def test_aio_matches_sync_api(self):
+        """testing if the asyncio get_sequences and walk return the same
+        results as the sync functions, and stat_sequences stats every item
+        """
+        seqs = self.collect(pyseq.aio.get_sequences(files_dir))
+        self.assertEqual([str(s) for s in seqs],
+                         [str(s) for s in pyseq.iget_sequences(files_dir)])
+
+        top = os.path.dirname(files_dir)
+        for kwargs in ({}, {'topdown': False}, {'level': 1}):
+            self.assertEqual(
+                [(root, dirs, [str(s) for s in seqs]) for root, dirs, seqs
+                 in self.collect(pyseq.aio.walk(top, limit=2, cache=False,
+                                                **kwargs))],
+                [(root, dirs, [str(s) for s in seqs]) for root, dirs, seqs
+                 in pyseq.walk(top, cache=False, **kwargs)]
+            )
+
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(pyseq.aio.stat_sequences(seqs, limit=2))
+        finally:
+            loop.close()
+        self.assertTrue(all(i._has_stat() for s in seqs for i in s))
+
+    def test_aio_get_sequences_streams_batches(self):
+        """testing if the asyncio get_sequences yields each batch of
+        sequences as it is grouped
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        class Executor(ThreadPoolExecutor):
+            calls = 0
+
+            def submit(self, *args):
+                self.calls += 1
+                return super(Executor, self).submit(*args)
+
+        names = ['s%03d.%04d.exr' % (i, f) for i in range(200)
+                 for f in (1, 2)]
+        executor = Executor(2)
+        loop = asyncio.new_event_loop()
+        try:
+            seqs = pyseq.aio.get_sequences(names, executor=executor)
+            first = loop.run_until_complete(seqs.__anext__())
+            self.assertEqual(str(first), 's000.1-2.exr')
+            self.assertEqual(executor.calls, 1)
+            loop.run_until_complete(seqs.aclose())
+            self.assertEqual(
+                [str(s) for s in self.collect(
+                    pyseq.aio.get_sequences(names, executor=executor))],
+                [str(s) for s in pyseq.iget_sequences(names)]
+            )
+            self.assertEqual(executor.calls,
+                             2 + 200 // pyseq.aio.sequence_batch_size)
+        finally:
+            loop.close()
+            executor.shutdown()
+
 
 class LSSTestCase(unittest.TestCase):
     """Tests lss command
@@ -691,5 +1817,66 @@ class LSSTestCase(unittest.TestCase):
         )
 
 
+    @unittest.skipIf(sys.version_info[0] > 2, 'lss is a python 2 script')
+    def test_lss_json(self):
+        """testing if lss --json and --ndjson print one JSON record per
+        sequence, matching the sequences of the directory
+        """
+        here = os.path.dirname(os.path.abspath(__file__))
+        lss = os.path.join(os.path.dirname(here), 'lss')
+        files = os.path.join(here, 'files')
+        seqs = get_sequences(files)
+
+        output = subprocess.check_output(
+            [sys.executable, lss, '--json', files], universal_newlines=True)
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(len(records), len(seqs))
+        for record, seq in zip(records, seqs):
+            self.assertEqual(record['dir'], files)
+            self.assertEqual(
+                record['head'] + record['pad'] + record['tail'],
+                seq.format('%h%p%t'))
+            self.assertEqual(record['length'], len(seq))
+            self.assertFalse('size' in record)
+        tga = [str(s) for s in seqs].index('a.1-14.tga')
+        record = records[tga]
+        self.assertEqual(record['ranges'], [[1, 3], [10, 10], [12, 14]])
+        self.assertEqual(record['missing'], [[4, 9], [11, 11]])
+
+        output = subprocess.check_output(
+            [sys.executable, lss, '--ndjson', '--sizes', '-r', here],
+            universal_newlines=True)
+        records = [json.loads(line) for line in output.splitlines()]
+        by_name = dict((r['head'] + r['pad'] + r['tail'], r) for r in records
+                       if r['dir'] == files)
+        self.assertEqual(by_name['a.%03d.tga']['size'], seqs[tga].size)
+        self.assertTrue(all('mtime' in r for r in records))
+
+    @unittest.skipIf(sys.version_info[0] > 2, 'lss is a python 2 script')
+    def test_lss_since(self):
+        """testing if lss --since prints the changes since a snapshot saved
+        with --snapshot, without sizes unless --sizes is given
+        """
+        here = os.path.dirname(os.path.abspath(__file__))
+        lss = os.path.join(os.path.dirname(here), 'lss')
+        top = tempfile.mkdtemp()
+        try:
+            for i in (1, 2, 3):
+                open(os.path.join(top, 'a.%04d.exr' % i), 'w').close()
+            snap = os.path.join(tempfile.mkdtemp(dir=top), 'snap.json')
+            subprocess.check_call([sys.executable, lss, '--snapshot', snap,
+                                   top])
+            entries = pyseq.Snapshot.load(snap).entries()
+            self.assertEqual([e[1:] for e in entries.values()],
+                             [(None, None)])
+            os.remove(os.path.join(top, 'a.0002.exr'))
+            output = subprocess.check_output(
+                [sys.executable, lss, '--since', snap, top],
+                universal_newlines=True)
+            self.assertEqual(output.split(),
+                             ['removed', os.path.join(top, 'a.%04d.exr'), '2'])
+        finally:
+            shutil.rmtree(top)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file